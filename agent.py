@@ -1,50 +1,103 @@
-from typing import Dict
+import os
+import json
+import asyncio
+from typing import Dict, List, Optional, Tuple
 from llm.model import ChatModel
-from tools import AiTools
-from openai import RateLimitError
-from langchain.agents import create_react_agent, AgentExecutor
-from playwright.async_api import async_playwright
-from langchain.memory import ConversationBufferMemory
-from util.logging_util import get_logger
+from langchain_core.runnables import RunnablePassthrough
+from langchain_core.tools import render_text_description
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from prompts import ToolCallingPrompt
+from util.logging_util import LANGCHAIN_VERBOSE, get_logger
+from util.scratchpad import ScratchpadManager
+from util.utils import TokenUtils
+from util.tracing import Tracer, TracingCallbackHandler, annotate, span
+from trajectory import READ_ONLY_TOOLS, TRAJECTORY_REPLAY, Macro, MacroReplayer, TrajectoryRecorder
 
 logger = get_logger(__name__)
 
+# "react" parses Thought/Action text; "tool_calling" uses native function calling with typed
+# arguments and runs the tool calls of one turn concurrently
+REACT = "react"
+TOOL_CALLING = "tool_calling"
+AGENT_MODE = os.getenv("AGENT_MODE", REACT)
+
 
 class Agent:
     """An AI Agent for planning and executing automation steps."""
 
-    def __init__(self, system: str = ""):
+    def __init__(
+        self,
+        system: str = "",
+        browser_context=None,
+        http_client=None,
+        macro_store=None,
+        selector_memory=None,
+        mode: str = AGENT_MODE,
+    ):
         logger.info("Initializing Agent Class")
+        if mode not in (REACT, TOOL_CALLING):
+            raise ValueError(f"Unknown agent mode {mode!r}; expected {REACT!r} or {TOOL_CALLING!r}.")
         self.system = system
+        self.mode = mode
+        self.browser_context = browser_context
+        self.http_client = http_client
+        self.macro_store = macro_store
+        self.selector_memory = selector_memory
         self.model = ChatModel.chat_model
         self.agent = None
+        self.tools_class = None
         self.tools_for_agent = []
-        print(f"system: {system}")
+        self.prompt = None
+        self.scratchpad = ScratchpadManager()
+        logger.debug(f"system: {system}")
 
     async def setup(self):
-        """Set up the async browser and tools, and build the Agent."""
-        playwright = await async_playwright().start()
-        browser = await playwright.chromium.launch(headless=False)
-        tools_class = AiTools(async_browser=browser)
-        self.tools_for_agent = tools_class.ai_tools(return_tool=True)
-
-        # Create a short‐term buffer memory
-        memory = ConversationBufferMemory(
-            k=1,
-            memory_key="agent_scratchpad",
-            return_messages=True
+        """Bind the tools to the leased browser context and shared HTTP client, and build the Agent."""
+        if self.browser_context is None:
+            raise ValueError("browser_context must be provided to set up the Agent.")
+        # Imported on first use, so the app starts without loading LangChain's agents and the toolkit
+        from langchain.agents import AgentExecutor
+        from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+        from langchain.agents.output_parsers import ReActSingleInputOutputParser
+        from langchain.agents.output_parsers.tools import ToolsAgentOutputParser
+        from tools import AiTools
+
+        self.tools_class = AiTools(
+            async_context=self.browser_context, http_client=self.http_client, selector_memory=self.selector_memory
         )
+        self.tools_for_agent = self.tools_class.ai_tools(return_tool=True, typed=self.mode == TOOL_CALLING)
 
-        agent = create_react_agent(
-            llm=self.model,
-            tools=self.tools_for_agent,
-            prompt=self.system)
+        if self.mode == TOOL_CALLING:
+            # Same pipeline as create_tool_calling_agent, with parallel calls and a bounded scratchpad
+            self.prompt = ToolCallingPrompt.get_prompt()
+            agent = (
+                RunnablePassthrough.assign(
+                    agent_scratchpad=lambda x: format_to_tool_messages(
+                        self.scratchpad.bound_steps(x["intermediate_steps"])
+                    )
+                )
+                | self.prompt
+                | self.model.bind_tools(self.tools_for_agent, parallel_tool_calls=True)
+                | ToolsAgentOutputParser()
+            )
+        else:
+            # Same pipeline as create_react_agent, but the scratchpad is rendered within a token budget
+            self.prompt = self.system.partial(
+                tools=render_text_description(self.tools_for_agent),
+                tool_names=", ".join(t.name for t in self.tools_for_agent),
+            )
+            agent = (
+                RunnablePassthrough.assign(agent_scratchpad=lambda x: self.scratchpad.format(x["intermediate_steps"]))
+                | self.prompt
+                | self.model.bind(stop=["\nObservation"])
+                | ReActSingleInputOutputParser()
+            )
 
         agent_executor = AgentExecutor(
             agent=agent,
             tools=self.tools_for_agent,
-            memory=memory,
-            verbose=True,
+            # Verbose mode prints every prompt and step to stdout, bypassing the logging pipeline
+            verbose=LANGCHAIN_VERBOSE,
             handle_parsing_errors=True,
             max_iterations=200,
             # max_execution_time=30,
@@ -52,20 +105,108 @@ class Agent:
 
         self.agent = agent_executor
 
-    async def run(self, user_message: str) -> Dict:
-        """Run the Agent after setup."""
+    async def run(self, user_message: str, callbacks: Optional[List] = None, run_id: Optional[str] = None) -> Dict:
+        """Run the Agent after setup, reporting steps to any LangChain callbacks.
+
+        Every run is traced; spans are written to traces/<run_id>.jsonl. With a macro
+        store, a recorded trajectory that fits the instruction is replayed first and
+        the LLM only takes over from the first step that fails.
+        """
+        from openai import RateLimitError
+
         if self.agent is None:
             await self.setup()
 
         logger.info(f"User_message: {user_message}")
+        self.tools_class.instruction = user_message
+        tracer = Tracer(run_id)
+        recorder = TrajectoryRecorder()
+        callbacks = list(callbacks or []) + [TracingCallbackHandler(tracer), recorder]
 
         try:
-            result = await self.agent.ainvoke({"input": user_message})
+            with tracer.activate(), span("agent_run", kind="run", instruction_bytes=len(user_message)):
+                replayed, done = await self._replay(user_message)
+                if replayed:
+                    result = {
+                        "input": user_message,
+                        "output": "Replayed a recorded trajectory:\n"
+                        + "\n".join(
+                            f"{step['tool']}: {step['observation']}"
+                            for step in done
+                            if step["tool"] not in READ_ONLY_TOOLS
+                        ),
+                        "replayed": True,
+                    }
+                else:
+                    agent_input = self._resume_input(user_message, done)
+                    self.scratchpad.reset(reserved_tokens=self._prompt_tokens(agent_input))
+                    result = await self.agent.ainvoke({"input": agent_input}, config={"callbacks": callbacks})
+                    result["input"] = user_message
+                    result["scratchpad"] = self.scratchpad.report()
+                    annotate(**result["scratchpad"])
+                    logger.info(f"Scratchpad tokens saved this run: {result['scratchpad']['saved_tokens']}")
+                # Downloads run in the background; finish them before returning the result
+                with span("download_wait", kind="http"):
+                    await self.tools_class.download_manager.wait_all()
+                if not replayed:
+                    await self._save_macro(user_message, result, done, recorder)
+            result["downloads"] = self.tools_class.download_manager.status()
         except RateLimitError:
             logger.warning("Rate limit exceeded.")
-            return {"error": "Rate limit exceeded. Try again later."}
+            return {"error": "Rate limit exceeded. Try again later.", "run_id": tracer.run_id}
         except Exception as e:
             logger.error(f"Unable to complete request, reason: {e}")
-            return {"error": str(e)}
+            return {"error": str(e), "run_id": tracer.run_id}
+        finally:
+            await asyncio.to_thread(tracer.export)
 
+        result["run_id"] = tracer.run_id
         return result
+
+    async def _replay(self, user_message: str) -> Tuple[bool, List[Dict]]:
+        """Replay a stored macro for the instruction, if there is one that fits."""
+        if self.macro_store is None or not TRAJECTORY_REPLAY:
+            return False, []
+        found = await self.macro_store.find(user_message)
+        if found is None:
+            return False, []
+
+        macro, bindings = found
+        with span("macro_replay", kind="replay", steps=len(macro.steps)):
+            replayed, done = await MacroReplayer(self.tools_for_agent).replay(macro, bindings)
+            annotate(replayed=replayed, steps_done=len(done))
+        await self.macro_store.record_outcome(macro, replayed)
+        logger.info(f"Macro replay {'succeeded' if replayed else 'failed'} after {len(done)} steps")
+        return replayed, done
+
+    async def _save_macro(self, user_message: str, result: Dict, done: List[Dict], recorder: TrajectoryRecorder):
+        """Store the successful steps of a finished run, once its downloads are known to have worked."""
+        if self.macro_store is None or result.get("output", "").startswith("Agent stopped"):
+            return
+        jobs = self.tools_class.download_manager.jobs
+
+        def download_done(job_id: str) -> bool:
+            return job_id in jobs and jobs[job_id].status == "done"
+
+        macro = Macro.from_recording(user_message, done + recorder.successful_actions(download_done))
+        if macro.steps:
+            await self.macro_store.save(macro)
+
+    def _prompt_tokens(self, agent_input: str) -> int:
+        """Tokens of the prompt without the scratchpad, including tool schemas."""
+        if self.mode == TOOL_CALLING:
+            messages = self.prompt.format_messages(input=agent_input, agent_scratchpad=[])
+            schemas = [convert_to_openai_tool(t) for t in self.tools_for_agent]
+            text = "\n".join(str(message.content) for message in messages) + json.dumps(schemas)
+        else:
+            text = self.prompt.format(input=agent_input, agent_scratchpad="")
+        return TokenUtils.token_count(text)
+
+    @staticmethod
+    def _resume_input(user_message: str, done: List[Dict]) -> str:
+        """Tell the LLM which replayed steps already ran, so it continues from there."""
+        done = [step for step in done if step["tool"] not in READ_ONLY_TOOLS]
+        if not done:
+            return user_message
+        steps = "\n".join(f"- {step['tool']}({step['tool_input']}): {step['observation']}" for step in done)
+        return f"{user_message}\n\nThese steps were already completed, continue from the current page:\n{steps}"
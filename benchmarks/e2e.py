@@ -0,0 +1,361 @@
+"""Offline end-to-end benchmark: the Agent against a local fixture site and a scripted model.
+
+Run from the project root (Playwright's Chromium must be installed):
+    python -m benchmarks.e2e --sizes small large huge --concurrency 4 --output bench.json
+
+Reports wall time per run, per-tool latency, peak RSS, the throughput of
+concurrent /run-agent/ requests and an import-time profile of the app, and saves
+everything as JSON so results can be compared between commits.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import sys
+import resource
+import statistics
+import subprocess
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+from benchmarks.fixtures import FixtureServer, trajectory
+from benchmarks.scripted_model import ScriptedChatModel, instruction_for
+
+# Tools whose latency is reported separately
+BENCH_TOOLS = ("navigate_tool", "fuzzy_fetch_html_tool", "fetch_all_elements_tool", "download_file_tool")
+# download_file_tool only queues the transfer; the run waits for it in this span
+BENCH_SPANS = BENCH_TOOLS + ("download_wait",)
+SEARCH_TERMS = ("Python", "Javascript", "Typescript", "Java", "Go", "C", "Rust", "PHP")
+
+
+def configure_environment(workdir: str) -> None:
+    """Keep traces and databases out of the project and measure the plain LLM path.
+
+    Must run before the project modules are imported, as they read settings at import.
+    """
+    os.environ["TRACE_DIR"] = os.path.join(workdir, "traces")
+    os.environ["JOB_DB_PATH"] = os.path.join(workdir, "jobs.db")
+    os.environ["MACRO_DB_PATH"] = os.path.join(workdir, "macros.db")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+    os.environ["SELECTOR_DB_PATH"] = os.path.join(workdir, "selectors.db")
+    os.environ["STATIC_CACHE_DIR"] = os.path.join(workdir, "static_cache")
+    os.environ["DOWNLOAD_INDEX_PATH"] = os.path.join(workdir, "downloads.db")
+    os.environ["LLM_CACHE"] = "false"
+    os.environ["SELECTOR_MEMORY"] = "false"
+    os.environ["TRAJECTORY_REPLAY"] = "false"
+    os.environ["FAN_OUT"] = "false"
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def describe(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.mean(values), 3),
+        "p50_ms": round(percentile(values, 0.5), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "max_ms": round(max(values), 3),
+    }
+
+
+def tool_latencies(run_ids: List[str], trace_dir: str) -> Dict[str, Dict[str, float]]:
+    """Collect tool and download wait span durations from the exported traces of the given runs."""
+    durations: Dict[str, List[float]] = {name: [] for name in BENCH_SPANS}
+    for run_id in run_ids:
+        path = os.path.join(trace_dir, f"{run_id}.jsonl")
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                if item["name"] in durations:
+                    durations[item["name"]].append(item["duration_ms"])
+    return {name: describe(values) for name, values in durations.items()}
+
+
+def peak_rss_mib() -> float:
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux).
+
+    Playwright's driver and Chromium run as child processes and are not included.
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def tree_rss_mib() -> Optional[float]:
+    """Current resident set size of this process and all its descendants, read from /proc (Linux only)."""
+    if not os.path.isdir("/proc/self"):
+        return None
+    children: Dict[int, List[int]] = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", encoding="utf-8") as f:
+                # The command name may contain spaces; fields after it are space-separated
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(name))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total = 0
+    pending = [os.getpid()]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f"/proc/{pid}/statm", encoding="utf-8") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            continue
+    return round(total / 1024 / 1024, 1)
+
+
+class TreeRssSampler:
+    """Sample the RSS of the process tree, which includes the browser, and keep the peak."""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.peak: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _sample(self) -> None:
+        while True:
+            current = await asyncio.to_thread(tree_rss_mib)
+            if current is not None:
+                self.peak = max(self.peak or 0.0, current)
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self) -> "TreeRssSampler":
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+
+
+def import_profile(module: str = "main", top: int = 15) -> Dict[str, Any]:
+    """Import the module in a fresh interpreter with -X importtime and report the slowest packages.
+
+    Also times warmup.preload() in another fresh interpreter, i.e. what the lazily
+    built model client, tokenizer and parsers cost the first run without warm-up.
+    """
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    by_package: Dict[str, int] = {}
+    module_us = 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us)
+        if name == module:
+            module_us = int(cumulative_us)
+    slowest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    preload = subprocess.run(
+        [sys.executable, "-c", "import json, warmup; print('PRELOAD ' + json.dumps(warmup.preload()))"],
+        capture_output=True, text=True,
+    )
+    # Log records are written to stdout from another thread, so find the line by its prefix
+    lines = [line for line in preload.stdout.splitlines() if line.startswith("PRELOAD ")]
+    warm_up = json.loads(lines[-1][len("PRELOAD "):]) if lines else None
+
+    return {
+        "module": module,
+        "ok": completed.returncode == 0,
+        "interpreter_wall_ms": round(wall_ms, 3),
+        "import_ms": round(module_us / 1000, 3),
+        "slowest_packages": [{"package": package, "self_ms": round(us / 1000, 3)} for package, us in slowest],
+        "warm_up_ms": warm_up,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def new_run(model: ScriptedChatModel, server: FixtureServer, workdir: str, term: str, size: str, pdf_kb: int) -> str:
+    """Register a scripted trajectory and return the instruction that selects it."""
+    run_key = uuid.uuid4().hex[:12]
+    save_as = os.path.join(workdir, "downloads", f"{term}-{run_key}.pdf")
+    model.add_script(run_key, trajectory(server.base_url, term, size, pdf_kb, save_as, run_key))
+    return instruction_for(run_key, f"Search for {term} and download the third paper as a PDF.")
+
+
+async def bench_sequential(args, model, server, workdir) -> List[Dict[str, Any]]:
+    """Run one Agent per page size, one at a time, directly on a leased context."""
+    from agent import Agent
+    from browser_pool import BrowserPool
+    from prompts import AgentSystemPrompt
+    from util.http_client import HttpClient
+
+    runs = []
+    async with BrowserPool(size=1) as browser_pool, HttpClient() as http_client:
+        for size in args.sizes:
+            for repeat in range(args.repeat):
+                instruction = new_run(model, server, workdir, SEARCH_TERMS[repeat % len(SEARCH_TERMS)], size, args.pdf_kb)
+                start = time.perf_counter()
+                async with browser_pool.lease() as browser_context:
+                    agent = Agent(
+                        system=AgentSystemPrompt.get_system_prompt(),
+                        browser_context=browser_context,
+                        http_client=http_client,
+                    )
+                    agent.model = model
+                    result = await agent.run(instruction)
+                runs.append({
+                    "size": size,
+                    "run_id": result.get("run_id"),
+                    "wall_ms": round((time.perf_counter() - start) * 1000, 3),
+                    "error": result.get("error"),
+                })
+                print(f"{size:<8} run {repeat + 1}: {runs[-1]['wall_ms']:.0f} ms" + (f" ({runs[-1]['error']})" if runs[-1]["error"] else ""))
+    return runs
+
+
+async def bench_concurrent(args, model, server, workdir) -> Dict[str, Any]:
+    """Send N concurrent /run-agent/ requests to the app served by uvicorn."""
+    import uvicorn
+    import main as app_module
+    from llm.model import ChatModel
+
+    # Agents built by the app pick the model up from ChatModel
+    ChatModel.chat_model = model
+    config = uvicorn.Config(app_module.app, host="127.0.0.1", port=args.app_port, log_level="warning")
+    server_task = uvicorn.Server(config)
+    serve = asyncio.create_task(server_task.serve())
+    while not server_task.started:
+        if serve.done():
+            serve.result()
+        await asyncio.sleep(0.05)
+
+    instructions = [
+        new_run(model, server, workdir, SEARCH_TERMS[i % len(SEARCH_TERMS)], args.concurrent_size, args.pdf_kb)
+        for i in range(args.concurrency)
+    ]
+
+    async def request(session: aiohttp.ClientSession, instruction: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        async with session.post(f"http://127.0.0.1:{args.app_port}/run-agent/", json={"instruction": instruction}) as response:
+            body = await response.json()
+        result = body.get("result") or {}
+        return {
+            "status": response.status,
+            "run_id": result.get("run_id"),
+            "latency_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    try:
+        timeout = aiohttp.ClientTimeout(total=None)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            start = time.perf_counter()
+            responses = await asyncio.gather(*(request(session, instruction) for instruction in instructions))
+            wall = time.perf_counter() - start
+    finally:
+        server_task.should_exit = True
+        await serve
+
+    ok = [response for response in responses if response["status"] == 200]
+    return {
+        "requests": args.concurrency,
+        "page_size": args.concurrent_size,
+        "succeeded": len(ok),
+        "wall_ms": round(wall * 1000, 3),
+        "throughput_runs_per_s": round(len(ok) / wall, 3) if wall else 0.0,
+        "latency": describe([response["latency_ms"] for response in responses]),
+        "run_ids": [response["run_id"] for response in ok],
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.makedirs(os.path.join(workdir, "downloads"))
+    configure_environment(workdir)
+    # Profiled first, in fresh interpreters with the same settings
+    startup = await asyncio.to_thread(import_profile, "main", args.import_top)
+    model = ScriptedChatModel(latency_seconds=args.llm_latency)
+
+    async with FixtureServer() as server, TreeRssSampler() as rss:
+        sequential = await bench_sequential(args, model, server, workdir)
+        concurrent = await bench_concurrent(args, model, server, workdir) if args.concurrency else None
+
+    trace_dir = os.environ["TRACE_DIR"]
+    run_ids = [run["run_id"] for run in sequential if run["run_id"]] + (concurrent["run_ids"] if concurrent else [])
+    by_size = {
+        size: describe([run["wall_ms"] for run in sequential if run["size"] == size and not run["error"]])
+        for size in args.sizes
+    }
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": vars(args),
+        "wall_time_by_size": by_size,
+        "runs": sequential,
+        "tool_latency": tool_latencies(run_ids, trace_dir),
+        "concurrent": concurrent,
+        "peak_rss_mib": peak_rss_mib(),
+        # Includes Playwright's driver and the browser; None where /proc is unavailable
+        "peak_tree_rss_mib": rss.peak,
+        "import_profile": startup,
+        "workdir": workdir,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium", "large"], choices=["small", "medium", "large", "huge"])
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--pdf-kb", type=int, default=512)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="simulated seconds per LLM call")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent /run-agent/ requests (0 to skip)")
+    parser.add_argument("--concurrent-size", default="medium", choices=["small", "medium", "large", "huge"])
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--import-top", type=int, default=15, help="packages listed in the import-time profile")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for name, stats in report["tool_latency"].items():
+        if stats["count"]:
+            print(f"{name:<26} mean {stats['mean_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms ({stats['count']} calls)")
+    if report["concurrent"]:
+        concurrent = report["concurrent"]
+        print(f"concurrent: {concurrent['succeeded']}/{concurrent['requests']} ok, {concurrent['throughput_runs_per_s']} runs/s")
+    startup = report["import_profile"]
+    print(f"import main: {startup['import_ms']:.0f} ms, slowest: " + ", ".join(
+        f"{item['package']} {item['self_ms']:.0f} ms" for item in startup["slowest_packages"][:5]
+    ))
+    if startup["warm_up_ms"]:
+        print(f"lazy init (warm-up): {startup['warm_up_ms']}")
+    tree = f"{report['peak_tree_rss_mib']} MiB" if report["peak_tree_rss_mib"] is not None else "not measured"
+    print(f"peak RSS: {report['peak_rss_mib']} MiB (Python only), {tree} (with the browser)")
+    print(f"results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
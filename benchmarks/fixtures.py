@@ -0,0 +1,129 @@
+"""Local HTTP fixture site for offline benchmarks.
+
+Serves arXiv-like search, abstract and PDF pages with DOMs from small to huge,
+so runs never touch the network:
+    /page/{size}                    a synthetic listing of the given size
+    /search?query=Python&size=large search results for a term
+    /abs/{paper}                    an abstract page with a "View PDF" link
+    /pdf/{paper}?kb=512             a synthetic PDF of the given size
+"""
+import json
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+from benchmarks.flatten import synthetic_html
+
+# Result rows (and nesting depth) of each page size
+PAGE_SIZES: Dict[str, tuple] = {
+    "small": (50, 4),
+    "medium": (500, 8),
+    "large": (3000, 12),
+    "huge": (12000, 12),
+}
+
+
+def synthetic_pdf(kb: int) -> bytes:
+    """Return a minimal valid PDF padded with a comment stream to about kb KiB."""
+    header = b"%PDF-1.4\n1 0 obj << /Type /Catalog /Pages 2 0 R >> endobj\n"
+    pages = b"2 0 obj << /Type /Pages /Kids [] /Count 0 >> endobj\n"
+    trailer = b"trailer << /Root 1 0 R >>\n%%EOF\n"
+    padding = max(kb * 1024 - len(header) - len(pages) - len(trailer), 0)
+    return header + pages + (b"%" + b"x" * 78 + b"\n") * (padding // 80) + trailer
+
+
+class FixtureServer:
+    """An aiohttp server for the fixture site, bound to a free local port."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+        self._pages: Dict[str, str] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self) -> "FixtureServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/page/{size}", self._page)
+        app.router.add_get("/search", self._search)
+        app.router.add_get("/abs/{paper}", self._abstract)
+        app.router.add_get("/pdf/{paper}", self._pdf)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Pick up the port the OS assigned
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _listing(self, size: str) -> str:
+        """Build each page size once; the huge pages take a while to render."""
+        if size not in self._pages:
+            rows, depth = PAGE_SIZES[size]
+            self._pages[size] = synthetic_html(rows, depth)
+        return self._pages[size]
+
+    async def _page(self, request: web.Request) -> web.Response:
+        size = request.match_info["size"]
+        if size not in PAGE_SIZES:
+            raise web.HTTPNotFound()
+        return web.Response(text=self._listing(size), content_type="text/html")
+
+    async def _search(self, request: web.Request) -> web.Response:
+        size = request.query.get("size", "medium")
+        if size not in PAGE_SIZES:
+            raise web.HTTPNotFound()
+        html = self._listing(size).replace("about Python", f"about {request.query.get('query', 'Python')}")
+        return web.Response(text=html, content_type="text/html")
+
+    async def _abstract(self, request: web.Request) -> web.Response:
+        paper = request.match_info["paper"]
+        kb = request.query.get("kb", "256")
+        html = (
+            f"<html><head><title>Paper {paper}</title></head><body>"
+            f"<h1 class='title'>Title of paper {paper}</h1>"
+            f"<div class='full-text'><h2>Access Paper:</h2>"
+            f"<button id='access-paper'>Access Paper</button>"
+            f"<a class='download-pdf' href='/pdf/{paper}?kb={kb}'>View PDF</a></div>"
+            f"<blockquote class='abstract'>{'Lorem ipsum dolor sit amet. ' * 40}</blockquote>"
+            "</body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def _pdf(self, request: web.Request) -> web.Response:
+        kb = int(request.query.get("kb", "256"))
+        return web.Response(body=synthetic_pdf(kb), content_type="application/pdf")
+
+
+def trajectory(base_url: str, term: str, size: str, pdf_kb: int, save_as: str, run_key: str) -> List[str]:
+    """ReAct responses that search for a term, inspect the results, open a paper and download its PDF.
+
+    The PDF URL carries the run key, so every run fetches it instead of reusing an earlier download.
+    """
+    search_url = f"{base_url}/search?query={term}&size={size}"
+    abstract_url = f"{base_url}/abs/3?kb={pdf_kb}"
+    steps = [
+        ("navigate_tool", search_url),
+        ("fuzzy_fetch_html_tool", json.dumps({"url": search_url, "search_text": f"Title of paper 3 about {term}"})),
+        ("fetch_all_elements_tool", json.dumps({"url": search_url})),
+        ("navigate_tool", abstract_url),
+        ("click_element_tool", "#access-paper"),
+        ("download_file_tool", json.dumps({"url": f"{base_url}/pdf/3?kb={pdf_kb}&run={run_key}", "save_as": save_as})),
+    ]
+    responses = [f"Thought: continue with the next step\nAction: {tool}\nAction Input: {tool_input}" for tool, tool_input in steps]
+    responses.append("Thought: I now know the final answer\nFinal Answer: Downloaded the PDF.")
+    return responses
@@ -0,0 +1,82 @@
+"""Compare the legacy per-tag get_text() walk with flatten_elements().
+
+Run from the project root:
+    python -m benchmarks.flatten --rows 2000 --depth 12
+"""
+import argparse
+import time
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from util.dom_snapshot import flatten_elements
+
+
+def synthetic_html(rows: int, depth: int) -> str:
+    """Build an arXiv-listing-like page with deeply nested result rows."""
+    row_parts = []
+    for i in range(rows):
+        inner = (
+            f'<a href="/abs/2506.{i:05d}" title="Abstract">arXiv:2506.{i:05d}</a>'
+            f'<span class="list-title">Title of paper {i} about Python</span>'
+            f"<!-- comment {i} --><script>var x{i} = {i};</script>"
+        )
+        for level in range(depth):
+            inner = f'<div class="level-{level}">{inner} text {level} </div>'
+        row_parts.append(f'<li class="arxiv-result">{inner}</li>')
+    return (
+        "<html><head><title>Search</title><style>li { color: red; }</style></head>"
+        f"<body><form><select name='subject'><option>Computer Science</option></select>"
+        f"<input name='query'><button>Search</button></form><ol>{''.join(row_parts)}</ol>"
+        "</body></html>"
+    )
+
+
+def legacy_flatten(soup: BeautifulSoup) -> List[str]:
+    """The original loop from fetch_all_elements_tool."""
+    results = []
+    for elem in soup.find_all(True):  # All tags
+        text = elem.get_text(strip=True)
+        attrs_string = " ".join([f'{k}="{v}"' for k, v in elem.attrs.items()])
+        if text and len(text) < 100:
+            results.append(f"<{elem.name} {attrs_string}>{text}</{elem.name}>")
+        else:
+            results.append(f"<{elem.name} {attrs_string}>")
+    return results
+
+
+def best_of(repeat: int, func, *args):
+    """Return the last result and the fastest wall time over repeat calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    html = synthetic_html(args.rows, args.depth)
+    soup = BeautifulSoup(html, "html.parser")
+    print(f"HTML size: {len(html) / 1024:.0f} KiB, tags: {len(soup.find_all(True))}")
+
+    legacy, legacy_seconds = best_of(args.repeat, legacy_flatten, soup)
+    elements, flatten_seconds = best_of(args.repeat, flatten_elements, soup)
+    flattened = [elem.element_string for elem in elements]
+
+    if flattened != legacy:
+        raise SystemExit("flatten_elements() output differs from the legacy walk")
+
+    print(f"legacy get_text walk: {legacy_seconds * 1000:.1f} ms")
+    print(f"flatten_elements:     {flatten_seconds * 1000:.1f} ms")
+    print(f"speedup:              {legacy_seconds / flatten_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Compare the SequenceMatcher and n-gram index engines on a synthetic page.
+
+Run from the project root:
+    python -m benchmarks.matcher --rows 2000 --query "Computer Science"
+"""
+import argparse
+import time
+
+from benchmarks.flatten import best_of, synthetic_html
+from util.dom_snapshot import PageSnapshot
+from util.matcher import NgramElementMatcher, SequenceElementMatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--query", default="Title of paper 42 about Python")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot = PageSnapshot.from_html("http://bench.local/", synthetic_html(args.rows, args.depth))
+    print(f"text elements: {len(snapshot.text_elements())}, query: {args.query!r}")
+
+    baseline, baseline_seconds = best_of(args.repeat, SequenceElementMatcher().match, snapshot, args.query)
+    expected = [elem.element_string for elem in baseline]
+    print(f"sequence:             {baseline_seconds * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    NgramElementMatcher().index(snapshot)
+    print(f"trigram index build:  {(time.perf_counter() - start) * 1000:.1f} ms (once per snapshot)")
+
+    for label, engine in (
+        ("trigram (rerank)", NgramElementMatcher(rerank=True)),
+        ("trigram (no rerank)", NgramElementMatcher(rerank=False)),
+    ):
+        result, seconds = best_of(args.repeat, engine.match, snapshot, args.query)
+        strings = [elem.element_string for elem in result]
+        overlap = len(set(expected) & set(strings))
+        same = "identical" if strings == expected else f"{overlap}/{len(expected)} shared"
+        print(f"{label + ':':<22}{seconds * 1000:.1f} ms ({same})")
+
+
+if __name__ == "__main__":
+    main()
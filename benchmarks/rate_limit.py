@@ -0,0 +1,126 @@
+"""Check the LLM rate limiter against a fake API that answers 429 with Retry-After.
+
+Run from the project root:
+    python -m benchmarks.rate_limit --rejections 2 --retry-after 0.3 --callers 4
+
+Exits with status 1 if a check fails.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from typing import Any, List, Optional
+
+import httpx
+from openai import RateLimitError
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from llm import rate_limiter
+from llm.rate_limiter import RateLimitedChatModel, RateLimiter
+
+USED_TOKENS = 42
+
+
+class RejectingChatModel(BaseChatModel):
+    """Fail the first calls with a 429 carrying Retry-After, then answer with a fixed token usage."""
+
+    rejections: int = 2
+    retry_after: float = 0.3
+    calls: int = 0
+    call_times: List[float] = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "rejecting"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        raise NotImplementedError("Only the async path is checked.")
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self.calls += 1
+        self.call_times.append(time.monotonic())
+        if self.calls <= self.rejections:
+            request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+            response = httpx.Response(429, headers={"retry-after": str(self.retry_after)}, request=request)
+            raise RateLimitError("Rate limit reached", response=response, body=None)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content="ok"))],
+            llm_output={"token_usage": {"total_tokens": USED_TOKENS}},
+        )
+
+
+async def check_backoff(rejections: int, retry_after: float, callers: int) -> List[str]:
+    """Return the failed checks of concurrent calls through a model that rejects the first calls."""
+    failures = []
+    inner = RejectingChatModel(rejections=rejections, retry_after=retry_after, call_times=[])
+    limiter = RateLimiter(requests_per_minute=1000, tokens_per_minute=1_000_000)
+    model = RateLimitedChatModel(inner=inner, limiter=limiter, max_retries=rejections + callers)
+
+    start = time.monotonic()
+    results = await asyncio.gather(
+        *(model.ainvoke([HumanMessage(content=f"call {index}")]) for index in range(callers)),
+        return_exceptions=True,
+    )
+    elapsed = time.monotonic() - start
+    errors = [result for result in results if isinstance(result, BaseException)]
+    print(f"callers: {callers}, API calls: {inner.calls}, elapsed: {elapsed:.2f}s, errors: {len(errors)}")
+
+    if errors:
+        return [f"{len(errors)} calls raised instead of backing off: {errors[0]!r}"]
+    if inner.calls != callers + rejections:
+        failures.append(f"expected {callers + rejections} API calls, got {inner.calls}")
+    # Every retry, and every caller queued behind a 429, waits at least Retry-After
+    last_rejection = inner.call_times[rejections - 1] if rejections else start
+    early = [t for t in inner.call_times[rejections:] if t - last_rejection < retry_after * 0.99]
+    if early:
+        failures.append(f"{len(early)} calls went out before Retry-After ({retry_after}s) had passed")
+    expected_tokens = sum(entry[1] for entry in limiter._window)
+    if limiter.metrics()["tokens_in_window"] != expected_tokens:
+        failures.append("tokens_in_window does not match the reservations in the window")
+    return failures
+
+
+def check_reconcile_after_expiry() -> List[str]:
+    """A reservation reconciled after it left the window must not change the window's token count."""
+    limiter = RateLimiter(requests_per_minute=10, tokens_per_minute=1000)
+    reservation = asyncio.run(limiter.acquire(100))
+    limiter._expire(time.monotonic() + rate_limiter.WINDOW_SECONDS)
+    limiter.reconcile(reservation, 300)
+    tokens = limiter.metrics()["tokens_in_window"]
+    print(f"tokens in window after reconciling an expired reservation: {tokens}")
+    return [] if tokens == 0 else [f"expired reservation changed tokens_in_window to {tokens}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rejections", type=int, default=2)
+    parser.add_argument("--retry-after", type=float, default=0.3)
+    parser.add_argument("--callers", type=int, default=4)
+    args = parser.parse_args()
+
+    failures = asyncio.run(check_backoff(args.rejections, args.retry_after, args.callers))
+    failures += check_reconcile_after_expiry()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""A chat model that replays fixed ReAct responses, so Agent runs need no API."""
+import re
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import Field
+
+# Instructions carry this marker so concurrent runs each follow their own script
+RUN_MARKER = re.compile(r"\[bench-run ([\w-]+)\]")
+
+
+def instruction_for(run_key: str, text: str) -> str:
+    return f"{text} [bench-run {run_key}]"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Answer each call with the next response of the script registered for the run."""
+
+    scripts: Dict[str, List[str]] = Field(default_factory=dict)
+    cursors: Dict[str, int] = Field(default_factory=dict)
+    # Simulated API latency per call
+    latency_seconds: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def add_script(self, run_key: str, responses: List[str]) -> None:
+        self.scripts[run_key] = responses
+        self.cursors[run_key] = 0
+
+    def _next(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        match = RUN_MARKER.search(prompt)
+        if match is None or match.group(1) not in self.scripts:
+            text = "Thought: I have no script for this run\nFinal Answer: unscripted"
+        else:
+            run_key = match.group(1)
+            script = self.scripts[run_key]
+            text = script[min(self.cursors[run_key], len(script) - 1)]
+            self.cursors[run_key] += 1
+        # Rough token counts so the tracing and rate limiting paths see realistic numbers
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(text) // 4}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))], llm_output={"token_usage": usage})
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._next(messages)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        return self._next(messages)
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        totals: Dict[str, int] = {}
+        for output in llm_outputs:
+            for key, value in ((output or {}).get("token_usage") or {}).items():
+                totals[key] = totals.get(key, 0) + value
+        return {"token_usage": totals}
@@ -0,0 +1,126 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+from util.load_policy import LoadPolicy
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Pool settings
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "true").lower() not in ("0", "false", "no")
+BROWSER_MAX_RUNS = int(os.getenv("BROWSER_MAX_RUNS", "20"))
+
+logger = get_logger(__name__)
+
+
+class PooledBrowser:
+    """A browser owned by the pool, with the number of runs it has served."""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.runs = 0
+
+    def is_healthy(self) -> bool:
+        """Return True if the browser process is still connected."""
+        return self.browser.is_connected()
+
+
+class BrowserPool:
+    """A fixed-size pool of Chromium browsers handing out isolated contexts per run."""
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        headless: bool = BROWSER_HEADLESS,
+        max_runs: int = BROWSER_MAX_RUNS,
+        load_policy: Optional[LoadPolicy] = None,
+    ):
+        """load_policy: Request blocking and caching applied to leased contexts; from the environment if None."""
+        if size < 1:
+            raise ValueError("Browser pool size must be at least 1.")
+        self.size = size
+        self.headless = headless
+        self.max_runs = max_runs
+        self.load_policy = load_policy if load_policy is not None else LoadPolicy.from_env()
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[PooledBrowser] = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """Start Playwright and launch every browser in the pool."""
+        if self._playwright is not None:
+            return
+        logger.info(f"Starting browser pool (size={self.size}, headless={self.headless})")
+        self._playwright = await async_playwright().start()
+        for _ in range(self.size):
+            pooled = PooledBrowser(await self._launch())
+            self._browsers.append(pooled)
+            self._idle.put_nowait(pooled)
+
+    async def close(self) -> None:
+        """Close every browser and stop Playwright."""
+        self._closed = True
+        for pooled in self._browsers:
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                logger.warning(f"Error closing pooled browser: {e}")
+        self._browsers.clear()
+
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        logger.info("Browser pool closed")
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[BrowserContext]:
+        """Lease an isolated browser context; it is closed when the block exits."""
+        if self._playwright is None or self._closed:
+            raise RuntimeError("Browser pool is not running.")
+
+        pooled = await self._idle.get()
+        context = None
+        try:
+            if not pooled.is_healthy() or pooled.runs >= self.max_runs:
+                await self._recycle(pooled)
+            context = await pooled.browser.new_context()
+            if self.load_policy is not None:
+                await self.load_policy.apply(context)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.warning(f"Error closing leased context: {e}")
+                pooled.runs += 1
+            self._idle.put_nowait(pooled)
+
+    async def _launch(self) -> Browser:
+        return await self._playwright.chromium.launch(headless=self.headless)
+
+    async def _recycle(self, pooled: PooledBrowser) -> None:
+        """Replace a browser that is unhealthy or has served max_runs."""
+        logger.info(f"Recycling pooled browser after {pooled.runs} runs")
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing recycled browser: {e}")
+        pooled.browser = await self._launch()
+        pooled.runs = 0
@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from util.logging_util import get_logger, log_context
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Scheduler settings
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", os.getenv("BROWSER_POOL_SIZE", "2")))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "1800"))
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = frozenset([SUCCEEDED, FAILED, CANCELLED])
+
+logger = get_logger(__name__)
+
+# A runner executes one job's instruction with its options and reports progress messages through the callback
+JobRunner = Callable[[str, str, Callable[[str], Awaitable[None]], Dict[str, Any]], Awaitable[Dict]]
+
+
+class JobStore:
+    """SQLite persistence for jobs and their progress events."""
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    instruction TEXT NOT NULL,
+                    options TEXT,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS job_events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    message TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq);
+                """
+            )
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """Run a statement in a worker thread so the event loop never waits on disk."""
+        return await asyncio.to_thread(self._execute, sql, params)
+
+    async def create(self, instruction: str, options: Optional[Dict[str, Any]] = None) -> str:
+        job_id = uuid.uuid4().hex
+        await self.execute(
+            "INSERT INTO jobs (id, instruction, options, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, instruction, json.dumps(options or {}), QUEUED, time.time()),
+        )
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        rows = await self.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        if not rows:
+            return None
+        job = dict(rows[0])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["options"] = json.loads(job["options"]) if job["options"] else {}
+        return job
+
+    def _update(self, sql: str, params: tuple) -> int:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    async def transition(self, job_id: str, from_status: str, to_status: str, error: Optional[str] = None) -> bool:
+        """Move a job from one status to another; returns False if it was no longer in from_status."""
+        column = "started_at" if to_status == RUNNING else "finished_at"
+        changed = await asyncio.to_thread(
+            self._update,
+            f"UPDATE jobs SET status = ?, error = ?, {column} = ? WHERE id = ? AND status = ?",
+            (to_status, error, time.time(), job_id, from_status),
+        )
+        return changed > 0
+
+    async def set_status(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        now = time.time()
+        if status == RUNNING:
+            await self.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?", (status, now, job_id))
+        else:
+            await self.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, default=str) if result is not None else None, error, now, job_id),
+            )
+
+    async def add_event(self, job_id: str, message: str) -> None:
+        await self.execute(
+            "INSERT INTO job_events (job_id, created_at, message) VALUES (?, ?, ?)",
+            (job_id, time.time(), message),
+        )
+
+    async def events(self, job_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
+        rows = await self.execute(
+            "SELECT seq, created_at, message FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after_seq),
+        )
+        return [dict(row) for row in rows]
+
+    async def recover(self) -> List[str]:
+        """Fail jobs interrupted by a restart and return the ids still queued."""
+        await self.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status = ?",
+            (FAILED, "Interrupted by a restart.", time.time(), RUNNING),
+        )
+        rows = await self.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,))
+        return [row["id"] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobScheduler:
+    """Runs queued jobs on a fixed number of workers with per-job timeouts."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: JobRunner,
+        concurrency: int = JOB_CONCURRENCY,
+        timeout: float = JOB_TIMEOUT,
+    ):
+        self.store = store
+        self.runner = runner
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._done: Dict[str, asyncio.Event] = {}
+        self._cancel_requested = set()
+
+    async def start(self) -> None:
+        """Requeue jobs left over from the last run and start the workers."""
+        for job_id in await self.store.recover():
+            self._enqueue(job_id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Job scheduler started with {self.concurrency} workers")
+
+    async def close(self) -> None:
+        """Stop the workers; running jobs are cancelled and marked as failed."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, instruction: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Persist a new job, queue it and return its id."""
+        job_id = await self.store.create(instruction, options)
+        await self.store.add_event(job_id, "Job queued.")
+        self._enqueue(job_id)
+        return job_id
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Wait for a job submitted to this scheduler to finish and return it."""
+        if job_id in self._done:
+            await self._done[job_id].wait()
+        return await self.store.get(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. Returns False if it already finished.
+
+        A worker that claims the job while it is being cancelled sees the request
+        before it starts the job, so a cancelled job never runs.
+        """
+        job = await self.store.get(job_id)
+        if job is None or job["status"] in FINISHED_STATES:
+            return False
+        self._cancel_requested.add(job_id)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        elif await self.store.transition(job_id, QUEUED, CANCELLED, error="Cancelled before start."):
+            self._cancel_requested.discard(job_id)
+            await self._announce(job_id, CANCELLED, "Cancelled before start.")
+        return True
+
+    def _enqueue(self, job_id: str) -> None:
+        self._done.setdefault(job_id, asyncio.Event())
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = await self.store.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    continue
+                # Only one of the worker and cancel() can move the job out of queued
+                if not await self.store.transition(job_id, QUEUED, RUNNING):
+                    continue
+                if job_id in self._cancel_requested:
+                    self._cancel_requested.discard(job_id)
+                    await self._finish(job_id, CANCELLED, error="Cancelled before start.")
+                    continue
+                await self._run(job_id, job["instruction"], job["options"])
+            except Exception as e:
+                logger.error(f"Job worker error for [{job_id}]: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str, instruction: str, options: Dict[str, Any]) -> None:
+        async def progress(message: str) -> None:
+            await self.store.add_event(job_id, message)
+
+        async def execute() -> Dict:
+            await progress("Job started.")
+            return await asyncio.wait_for(self.runner(job_id, instruction, progress, options), self.timeout)
+
+        # Register the task before any await so cancel() can always reach it; its logs carry the job id
+        with log_context(job_id):
+            task = asyncio.create_task(execute())
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if job_id in self._cancel_requested:
+                await self._finish(job_id, CANCELLED)
+            else:
+                # The worker itself is shutting down
+                task.cancel()
+                await self._finish(job_id, FAILED, error="Interrupted by shutdown.")
+                raise
+        except asyncio.TimeoutError:
+            await self._finish(job_id, FAILED, error=f"Timed out after {self.timeout:.0f}s.")
+        except Exception as e:
+            await self._finish(job_id, FAILED, error=str(e))
+        else:
+            if isinstance(result, dict) and "error" in result:
+                await self._finish(job_id, FAILED, result=result, error=str(result["error"]))
+            else:
+                await self._finish(job_id, SUCCEEDED, result=result)
+        finally:
+            self._running.pop(job_id, None)
+            self._cancel_requested.discard(job_id)
+
+    async def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        await self.store.set_status(job_id, status, result=result, error=error)
+        await self._announce(job_id, status, error)
+
+    async def _announce(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        await self.store.add_event(job_id, f"Job {status}." + (f" {error}" if error else ""))
+        done = self._done.pop(job_id, None)
+        if done is not None:
+            done.set()
+
+
+class JobProgressHandler(AsyncCallbackHandler):
+    """Forward each agent action to the job's progress log."""
+
+    def __init__(self, progress: Callable[[str], Awaitable[None]]):
+        self.progress = progress
+
+    async def on_agent_action(self, action, **kwargs) -> None:
+        await self.progress(f"{action.tool}: {str(action.tool_input)[:200]}")
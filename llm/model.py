@@ -1,7 +1,9 @@
 import os
+import threading
 from dotenv import find_dotenv
 from dotenv import load_dotenv
-from langchain_openai.chat_models import ChatOpenAI
+
+from util.logging_util import LANGCHAIN_VERBOSE
 
 # Load the environment variables
 load_dotenv(find_dotenv())
@@ -10,12 +12,83 @@ load_dotenv(find_dotenv())
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "default")
 MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "default")
 
+# Budgets shared by every agent run in the process
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "30000"))
+
+# Persistent cache of temperature-0 responses
+TEMPERATURE = 0
+LLM_CACHE = os.getenv("LLM_CACHE", "true").lower() not in ("0", "false", "no")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+class _Lazy:
+    """Class attribute built by its factory on first access, then stored on the class.
+
+    Assigning the attribute, e.g. to swap in another chat model, replaces it as usual.
+    """
+
+    _lock = threading.RLock()
+
+    def __init__(self, factory):
+        self.factory = factory
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with self._lock:
+            value = owner.__dict__[self.name]
+            if value is self:
+                value = self.factory(owner)
+                setattr(owner, self.name, value)
+            return value
+
+
+def _rate_limiter(owner):
+    from llm.rate_limiter import RateLimiter
+
+    return RateLimiter(requests_per_minute=LLM_REQUESTS_PER_MINUTE, tokens_per_minute=LLM_TOKENS_PER_MINUTE)
+
+
+def _response_cache(owner):
+    from llm.response_cache import ResponseCache
+
+    return ResponseCache(
+        path=LLM_CACHE_PATH,
+        max_bytes=int(LLM_CACHE_MAX_MB * 1024 * 1024),
+        ttl_seconds=LLM_CACHE_TTL,
+    )
+
+
+def _chat_model(owner):
+    # The OpenAI client is the slowest import of the app, so it is only loaded on first use
+    from langchain_openai.chat_models import ChatOpenAI
+    from llm.rate_limiter import RateLimitedChatModel
+    from llm.response_cache import CachedChatModel
+
+    chat_model = RateLimitedChatModel(
+        inner=ChatOpenAI(
+            api_key=OPENAI_API_KEY,
+            model=MODEL_NAME,
+            temperature=TEMPERATURE,
+            verbose=LANGCHAIN_VERBOSE,
+            # 429s are retried by RateLimitedChatModel so the shared limiter sees them
+            max_retries=0,
+        ),
+        limiter=owner.rate_limiter,
+        verbose=LANGCHAIN_VERBOSE,
+    )
+    # Only deterministic calls can be answered from the cache; hits skip the rate limiter too
+    if LLM_CACHE and TEMPERATURE == 0:
+        chat_model = CachedChatModel(inner=chat_model, response_cache=owner.response_cache, llm_name=MODEL_NAME)
+    return chat_model
+
 
-# Create the OpenAI chat model
+# Create the OpenAI chat model; each part is built on first use and shared by every run
 class ChatModel:
-    chat_model = ChatOpenAI(
-        api_key=OPENAI_API_KEY,
-        model=MODEL_NAME,
-        temperature=0,
-        verbose=True,
-    )
\ No newline at end of file
+    rate_limiter = _Lazy(_rate_limiter)
+    response_cache = _Lazy(_response_cache)
+    chat_model = _Lazy(_chat_model)
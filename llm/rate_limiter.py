@@ -0,0 +1,183 @@
+import json
+import time
+import random
+import asyncio
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+from openai import RateLimitError
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from util.utils import TokenUtils
+from util.logging_util import get_logger
+
+logger = get_logger(__name__)
+
+# Length of the sliding window the budgets apply to
+WINDOW_SECONDS = 60.0
+
+
+class RateLimiter:
+    """Process-wide request and token budgets per minute, granted in FIFO order."""
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # [timestamp, tokens] for every request in the current window
+        self._window: deque = deque()
+        self._tokens_in_window = 0
+        # asyncio.Lock wakes waiters in FIFO order, which keeps runs fair
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def acquire(self, tokens: int) -> List:
+        """Wait until the request fits both budgets and return its reservation."""
+        # A single request larger than the budget would never fit
+        tokens = min(tokens, self.tokens_per_minute)
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._expire(now)
+                delay = self._paused_until - now
+                if delay <= 0:
+                    delay = self._delay_for(tokens, now)
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+
+            reservation = [now, tokens]
+            self._window.append(reservation)
+            self._tokens_in_window += tokens
+
+        waited = time.monotonic() - start
+        self.waits += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 1:
+            logger.info(f"LLM call waited {waited:.1f}s for rate limit capacity")
+        return reservation
+
+    def reconcile(self, reservation: List, actual_tokens: int) -> None:
+        """Replace a reservation's estimate with the tokens the call actually used.
+
+        A reservation that already left the window no longer counts, so only its
+        entry is updated.
+        """
+        if any(entry is reservation for entry in self._window):
+            self._tokens_in_window += actual_tokens - reservation[1]
+        reservation[1] = actual_tokens
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller back, e.g. after the API answered 429 with Retry-After."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def metrics(self) -> Dict[str, float]:
+        """Return queue wait statistics."""
+        return {
+            "requests": self.waits,
+            "total_wait_seconds": round(self.total_wait, 3),
+            "mean_wait_seconds": round(self.total_wait / self.waits, 3) if self.waits else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+            "tokens_in_window": self._tokens_in_window,
+            "requests_in_window": len(self._window),
+        }
+
+    def _expire(self, now: float) -> None:
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            _, tokens = self._window.popleft()
+            self._tokens_in_window -= tokens
+
+    def _delay_for(self, tokens: int, now: float) -> float:
+        """Return how long until a request of this size fits, or 0 if it fits now."""
+        if len(self._window) < self.requests_per_minute and self._tokens_in_window + tokens <= self.tokens_per_minute:
+            return 0.0
+        # Wait for the oldest entries to leave the window until the request fits
+        freed = self._tokens_in_window
+        count = len(self._window)
+        for timestamp, entry_tokens in self._window:
+            freed -= entry_tokens
+            count -= 1
+            if count < self.requests_per_minute and freed + tokens <= self.tokens_per_minute:
+                return timestamp + WINDOW_SECONDS - now
+        return WINDOW_SECONDS
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """Wrap a chat model with a shared RateLimiter and 429 backoff."""
+
+    inner: BaseChatModel
+    limiter: Any
+    expected_completion_tokens: int = 500
+    max_retries: int = 5
+    base_delay: float = 1.0
+
+    @property
+    def _llm_type(self) -> str:
+        return f"rate-limited-{self.inner._llm_type}"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        """Bind OpenAI-format tool schemas; they reach the inner model as call kwargs."""
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        # Keep the inner model's token usage visible to callbacks
+        return self.inner._combine_llm_outputs(llm_outputs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # The agent only calls the async path; sync calls are passed straight through
+        return self.inner._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt_tokens = sum(TokenUtils.token_count(str(message.content)) for message in messages)
+        if kwargs.get("tools"):
+            # Tool schemas are sent with every call
+            prompt_tokens += TokenUtils.token_count(json.dumps(kwargs["tools"]))
+        attempt = 0
+        while True:
+            reservation = await self.limiter.acquire(prompt_tokens + self.expected_completion_tokens)
+            try:
+                result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+            except RateLimitError as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._retry_after(e) or self.base_delay * (2 ** attempt)
+                delay *= random.uniform(1.0, 1.5)
+                self.limiter.pause(delay)
+                logger.warning(f"LLM rate limited (attempt {attempt + 1}), backing off {delay:.1f}s")
+                attempt += 1
+                continue
+
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            if usage.get("total_tokens"):
+                self.limiter.reconcile(reservation, usage["total_tokens"])
+            return result
+
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> Optional[float]:
+        response = getattr(error, "response", None)
+        value = response.headers.get("retry-after") if response is not None else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
@@ -0,0 +1,201 @@
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.load import dumps, loads
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Per-run switch; set through bypass_cache() so concurrent runs do not affect each other
+_cache_enabled: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_enabled", default=True)
+
+
+@contextmanager
+def bypass_cache(bypass: bool = True) -> Iterator[None]:
+    """Skip the response cache for LLM calls made inside the block, including tasks it starts."""
+    token = _cache_enabled.set(_cache_enabled.get() and not bypass)
+    try:
+        yield
+    finally:
+        _cache_enabled.reset(token)
+
+
+class ResponseCache:
+    """SQLite store of LLM responses with a TTL and least-recently-used eviction by size."""
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    used_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS responses_used ON responses (used_at);
+                """
+            )
+            self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @staticmethod
+    def key(model_name: str, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> str:
+        """Hash the model, the whitespace-normalised prompt, stop words and tool schema.
+
+        Tool calls of AI messages and the call ids tool results answer are part of the
+        prompt, so two conversations that differ only in them never share a key.
+        """
+        prompt = [
+            (
+                message.type,
+                " ".join(str(message.content).split()),
+                getattr(message, "tool_calls", None) or [],
+                getattr(message, "tool_call_id", None),
+                message.additional_kwargs,
+            )
+            for message in messages
+        ]
+        payload = json.dumps(
+            {"model": model_name, "prompt": prompt, "stop": stop, "params": kwargs},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[ChatGeneration]]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, size, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._bytes -= row[1]
+                self.expired += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return loads(row[0])
+
+    def put(self, key: str, model_name: str, generations: List[ChatGeneration]) -> None:
+        value = dumps(generations)
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, value, size, now, now),
+            )
+            self._bytes += size - (old[0] if old else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop the least recently used responses until the cache fits max_bytes."""
+        while self._bytes > self.max_bytes:
+            row = self._conn.execute("SELECT key, size FROM responses ORDER BY used_at LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._bytes -= row[1]
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._bytes = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class CachedChatModel(BaseChatModel):
+    """Serve repeated deterministic (temperature 0) chat calls from a ResponseCache."""
+
+    inner: BaseChatModel
+    response_cache: Any
+    llm_name: str
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cached-{self.inner._llm_type}"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        """Bind OpenAI-format tool schemas; they reach the inner model as call kwargs."""
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _combine_llm_outputs(self, llm_outputs: List[Optional[dict]]) -> dict:
+        combined = self.inner._combine_llm_outputs(llm_outputs)
+        # Let callbacks see whether the call was answered from the cache
+        combined["cache_hit"] = any(output and output.get("cache_hit") for output in llm_outputs)
+        return combined
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # The agent only calls the async path; sync calls are passed straight through
+        return self.inner._generate(messages, stop=stop, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not _cache_enabled.get():
+            return await self.inner._agenerate(messages, stop=stop, **kwargs)
+
+        key = self.response_cache.key(self.llm_name, messages, stop, **kwargs)
+        generations = await asyncio.to_thread(self.response_cache.get, key)
+        if generations is not None:
+            for generation in generations:
+                # Nothing was billed for this call
+                generation.message.usage_metadata = None
+            return ChatResult(generations=generations, llm_output={"token_usage": {}, "cache_hit": True})
+
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        await asyncio.to_thread(self.response_cache.put, key, self.llm_name, result.generations)
+        llm_output = dict(result.llm_output or {})
+        llm_output["cache_hit"] = False
+        return ChatResult(generations=result.generations, llm_output=llm_output)
@@ -1,36 +1,183 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 # import uvicorn
+import json
 import asyncio
 from prompts import AgentSystemPrompt
 from agent import Agent
+from browser_pool import BrowserPool
+from util.http_client import HttpClient
+from llm.model import ChatModel
+from util.tracing import load_summary
+from trajectory import MacroStore
+from util.selector_memory import SELECTOR_MEMORY, SelectorMemory
+from planner import FAN_OUT, FanOut, TaskPlanner
+from llm.response_cache import bypass_cache
+from jobs import CANCELLED, FINISHED_STATES, SUCCEEDED, JobProgressHandler, JobScheduler, JobStore
 from util.logging_util import get_logger
 from user_input import USER_INPUT
+from warmup import WARM_UP, warm_up
 
 # Init logger
 logger = get_logger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Own the shared browser pool, HTTP client, macro and selector stores and job scheduler for the lifetime of the app."""
+    browser_pool = BrowserPool()
+    await browser_pool.start()
+    app.state.browser_pool = browser_pool
+    app.state.http_client = HttpClient()
+    app.state.macro_store = MacroStore()
+    app.state.selector_memory = SelectorMemory() if SELECTOR_MEMORY else None
+    # The model client, tokenizer and parsers load in the background while the app already serves
+    app.state.warm_up = asyncio.create_task(warm_up()) if WARM_UP else None
+
+    async def run_job(job_id: str, instruction: str, progress, options: dict) -> dict:
+        async def run_subtask(subtask: str, run_id: str) -> dict:
+            async with browser_pool.lease() as browser_context:
+                agent = Agent(
+                    system=AgentSystemPrompt.get_system_prompt(),
+                    browser_context=browser_context,
+                    http_client=app.state.http_client,
+                    macro_store=app.state.macro_store,
+                    selector_memory=app.state.selector_memory,
+                )
+                return await agent.run(subtask, callbacks=[JobProgressHandler(progress)], run_id=run_id)
+
+        with bypass_cache(not options.get("use_cache", True)):
+            if not FAN_OUT:
+                return await run_subtask(instruction, job_id)
+            # Each sub-task leases its own context, so independent parts run in parallel
+            fan_out = FanOut(TaskPlanner(ChatModel.chat_model), run_subtask, progress=progress)
+            return await fan_out.run(instruction, job_id)
+
+    job_store = JobStore()
+    app.state.scheduler = JobScheduler(job_store, run_job)
+    await app.state.scheduler.start()
+    try:
+        yield
+    finally:
+        await app.state.scheduler.close()
+        job_store.close()
+        app.state.macro_store.close()
+        if app.state.selector_memory is not None:
+            app.state.selector_memory.close()
+        await app.state.http_client.close()
+        await browser_pool.close()
+
 # Initialize app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Pydantic model for user input
 class UserInput(BaseModel):
     instruction: str
+    # Set to false to skip the LLM response cache, e.g. when retrying a failed run
+    use_cache: bool = True
 
 @app.post("/run-agent/")
-async def run_agent(data: UserInput):
-    """Run the Agent with user input."""
+async def run_agent(data: UserInput, request: Request):
+    """Run the Agent with user input and wait for the result."""
     logger.info("Application Started via API Request")
-    prompt_template = AgentSystemPrompt.get_system_prompt()
-    agent = Agent(system=prompt_template)
 
     try:
-        result = await agent.run(data.instruction)
-        return {"status": "success", "result": result}
+        scheduler = request.app.state.scheduler
+        job_id = await scheduler.submit(data.instruction, {"use_cache": data.use_cache})
+        job = await scheduler.wait(job_id)
     except Exception as e:
         logger.error(f"Unable to complete request, reason: {e}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
-    
+
+    # A job cancelled through DELETE /jobs/{job_id} has no result to return
+    if job["status"] == CANCELLED:
+        raise HTTPException(status_code=409, detail="Job cancelled.")
+    if job["status"] != SUCCEEDED and job["result"] is None:
+        logger.error(f"Unable to complete request, reason: {job['error']}")
+        raise HTTPException(status_code=500, detail=f"Error: {job['error']}")
+    return {"status": "success", "result": job["result"]}
+
+@app.post("/jobs/")
+async def submit_job(data: UserInput, request: Request):
+    """Queue an Agent run and return its job id."""
+    job_id = await request.app.state.scheduler.submit(data.instruction, {"use_cache": data.use_cache})
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, request: Request):
+    """Return the status and, once finished, the result of a job."""
+    job = await request.app.state.scheduler.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Stream a job's progress events as server-sent events until it finishes."""
+    store = request.app.state.scheduler.store
+    if await store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        last_seq = 0
+        while True:
+            for event in await store.events(job_id, after_seq=last_seq):
+                last_seq = event["seq"]
+                yield f"data: {json.dumps(event)}\n\n"
+            job = await store.get(job_id)
+            if job["status"] in FINISHED_STATES:
+                # Flush events written after the last poll
+                for event in await store.events(job_id, after_seq=last_seq):
+                    yield f"data: {json.dumps(event)}\n\n"
+                return
+            if await request.is_disconnected():
+                return
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, request: Request):
+    """Cancel a queued or running job."""
+    if not await request.app.state.scheduler.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not running")
+    return {"job_id": job_id, "status": "cancelled"}
+
+@app.get("/jobs/{job_id}/trace")
+async def get_job_trace(job_id: str):
+    """Return the latency breakdown of a finished job from its trace."""
+    summary = await asyncio.to_thread(load_summary, job_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail=f"No trace for job {job_id}")
+    return summary
+
+@app.get("/metrics/llm")
+async def llm_metrics():
+    """Return queue wait statistics of the shared LLM rate limiter."""
+    return ChatModel.rate_limiter.metrics()
+
+@app.get("/metrics/llm-cache")
+async def llm_cache_metrics():
+    """Return hit/miss and size statistics of the LLM response cache."""
+    return ChatModel.response_cache.metrics()
+
+@app.get("/metrics/page-load")
+async def page_load_metrics(request: Request):
+    """Return navigation timing and blocked/cached request counts per site."""
+    load_policy = request.app.state.browser_pool.load_policy
+    if load_policy is None:
+        raise HTTPException(status_code=404, detail="Load policy is disabled")
+    return load_policy.metrics()
+
+@app.get("/metrics/selectors")
+async def selector_metrics(request: Request):
+    """Return hit/miss statistics of the learned selector memory."""
+    if request.app.state.selector_memory is None:
+        raise HTTPException(status_code=404, detail="Selector memory is disabled")
+    return await request.app.state.selector_memory.metrics()
+
 # To test
 async def main():
     logger.info("Application Started")
@@ -38,14 +185,28 @@ async def main():
     # Get prompt template
     prompt_template = AgentSystemPrompt.get_system_prompt()
 
-    # Send prompt to Agent
-    agent = Agent(system=prompt_template)
-
     # Get example user prompt from user_input.py
     user_instructions = USER_INPUT
 
     try:
-        await agent.run(user_instructions)
+        async with BrowserPool(size=1) as browser_pool, HttpClient() as http_client:
+            macro_store = MacroStore()
+            selector_memory = SelectorMemory() if SELECTOR_MEMORY else None
+            try:
+                async with browser_pool.lease() as browser_context:
+                    # Send prompt to Agent
+                    agent = Agent(
+                        system=prompt_template,
+                        browser_context=browser_context,
+                        http_client=http_client,
+                        macro_store=macro_store,
+                        selector_memory=selector_memory,
+                    )
+                    await agent.run(user_instructions)
+            finally:
+                macro_store.close()
+                if selector_memory is not None:
+                    selector_memory.close()
     except Exception as e:
         logger.error(f"Unable to complete request, reason: {e}")
 
@@ -0,0 +1,137 @@
+import os
+import re
+import json
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from prompts import PlannerPrompt
+from llm.response_cache import bypass_cache
+from util.logging_util import get_logger
+from util.tracing import Tracer, annotate, span
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Fan-out settings; off by default, since planning adds an LLM call to every job
+FAN_OUT = os.getenv("FAN_OUT", "false").lower() not in ("0", "false", "no")
+SUBTASK_CONCURRENCY = int(os.getenv("SUBTASK_CONCURRENCY", os.getenv("BROWSER_POOL_SIZE", "2")))
+SUBTASK_MAX_ATTEMPTS = int(os.getenv("SUBTASK_MAX_ATTEMPTS", "2"))
+
+logger = get_logger(__name__)
+
+# A sub-task runner executes one sub-task instruction under the given run id, in its own browser context
+SubtaskRunner = Callable[[str, str], Awaitable[Dict]]
+
+
+class TaskPlanner:
+    """Ask the LLM to split an instruction into independent, self-contained sub-tasks."""
+
+    def __init__(self, model):
+        self.chain = PlannerPrompt.get_prompt() | model
+
+    async def plan(self, instruction: str) -> List[str]:
+        """Return the sub-task instructions, or the instruction itself if it cannot be split."""
+        try:
+            message = await self.chain.ainvoke({"input": instruction})
+            subtasks = self.parse(str(message.content))
+        except Exception as e:
+            logger.warning(f"Planning failed, running the instruction as one task: {e}")
+            return [instruction]
+        return subtasks or [instruction]
+
+    @staticmethod
+    def parse(text: str) -> List[str]:
+        """Read the sub-task list from the model's JSON reply, tolerating code fences around it."""
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        if match is None:
+            return []
+        subtasks = json.loads(match.group(0)).get("subtasks") or []
+        return [task.strip() for task in subtasks if isinstance(task, str) and task.strip()]
+
+
+class FanOut:
+    """Run the sub-tasks of an instruction concurrently and merge their results."""
+
+    def __init__(
+        self,
+        planner: TaskPlanner,
+        runner: SubtaskRunner,
+        concurrency: int = SUBTASK_CONCURRENCY,
+        max_attempts: int = SUBTASK_MAX_ATTEMPTS,
+        progress: Optional[Callable[[str], Awaitable[None]]] = None,
+    ):
+        self.planner = planner
+        self.runner = runner
+        self.max_attempts = max_attempts
+        self.progress = progress
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(self, instruction: str, run_id: str) -> Dict[str, Any]:
+        """Plan, run each sub-task in isolation and return one merged result.
+
+        An instruction that does not split is run directly under run_id. Otherwise
+        sub-task i runs as <run_id>-<i>, and run_id keeps the planning trace.
+        """
+        tracer = Tracer(run_id)
+        with tracer.activate(), span("plan", kind="llm"):
+            subtasks = await self.planner.plan(instruction)
+            annotate(subtasks=len(subtasks))
+        if len(subtasks) == 1:
+            return await self.runner(instruction, run_id)
+
+        await asyncio.to_thread(tracer.export)
+        logger.info(f"Split instruction into {len(subtasks)} sub-tasks")
+        await self._report(f"Split into {len(subtasks)} sub-tasks.")
+        results = await asyncio.gather(
+            *(self._run_subtask(subtask, f"{run_id}-{index}") for index, subtask in enumerate(subtasks, 1))
+        )
+        return self.merge(instruction, run_id, results)
+
+    async def _run_subtask(self, instruction: str, run_id: str) -> Dict[str, Any]:
+        """Run one sub-task, retrying failures; an exception never affects the other sub-tasks."""
+        result: Dict[str, Any] = {}
+        attempt = 0
+        async with self._semaphore:
+            while attempt < self.max_attempts:
+                attempt += 1
+                await self._report(f"Sub-task {run_id} started (attempt {attempt}).")
+                try:
+                    # A retry must not replay the cached responses of the attempt that failed
+                    with bypass_cache(attempt > 1):
+                        result = await self.runner(instruction, run_id)
+                except Exception as e:
+                    logger.error(f"Sub-task {run_id} failed: {e}")
+                    result = {"error": str(e), "run_id": run_id}
+                if "error" not in result:
+                    break
+                await self._report(f"Sub-task {run_id} failed: {result['error']}")
+        return {"instruction": instruction, "attempts": attempt, **result}
+
+    async def _report(self, message: str) -> None:
+        if self.progress is not None:
+            await self.progress(message)
+
+    @staticmethod
+    def merge(instruction: str, run_id: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine sub-task results; the run only fails if every sub-task failed."""
+        subtasks = [
+            {
+                "instruction": result["instruction"],
+                "run_id": result.get("run_id"),
+                "attempts": result["attempts"],
+                "status": "failed" if "error" in result else "succeeded",
+                "output": result.get("error") or result.get("output", ""),
+            }
+            for result in results
+        ]
+        if all(subtask["status"] == "failed" for subtask in subtasks):
+            return {"error": "Every sub-task failed.", "subtasks": subtasks, "run_id": run_id}
+
+        output = "\n".join(
+            f"[{index}] {subtask['status']}: {subtask['output']}" for index, subtask in enumerate(subtasks, 1)
+        )
+        downloads = "\n".join(result["downloads"] for result in results if result.get("downloads"))
+        return {"input": instruction, "output": output, "subtasks": subtasks, "downloads": downloads, "run_id": run_id}
@@ -1,7 +1,7 @@
 # import os
 from dotenv import find_dotenv
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
 load_dotenv(find_dotenv())
 
@@ -31,6 +31,7 @@ Your Goal:
 - Follow the user's instructions line by line.
 - Always begin by navigating to the page url.
 - Next get elements from the page using the fuzzy_fetch_html_tool to get potential elements that can be used to perform your action.
+- When you need several elements from the same page, such as the fields and button of a form, get them all with one fuzzy_fetch_batch_tool call.
 - After elemnts have been returned choose the one you think is best go do the job.
 - If you cannot find element then use the get_all_elements tool, but it should only be a last option, and it should only be called once per page.
 - And once the get_all_elements tool has been called on one page, as long as you're still on that page don't call either fuzzy_fetch_html_tool or get_all_elements tool. Use the information get_all_elements tool has already provided to get what you need.
@@ -50,11 +51,17 @@ Action Input: "https://example.com"
 # Click by giving a selector
 Action: click_element_tool
 Action Input: "element_name"
+# Search results may start with a remembered selector that worked on this site before; click it if it fits the results.
 
 # Fetch elements from a page using fuzzy logic and search text
 Action: fuzzy_fetch_html_tool
 Action Input: ("url": "current_page_url", "search_text": "search phrase from user description") in JSON
 
+# Find several elements of the same page in one call, e.g. to fill a form. Tags (input, button, a, select, textarea) are optional.
+Action: fuzzy_fetch_batch_tool
+Action Input: ("url": "current_page_url", "queries": [("text": "search box", "tags": ["input"]), ("text": "search button", "tags": ["button"])]) in JSON
+# Each element is listed once as [eN]; the matches for every phrase refer to those ids.
+
 # Fetch all elements from a page using only the url link
 Action: fetch_all_elements_tool
 Action Input: ("url": "current_page_url") in JSON
@@ -62,6 +69,11 @@ Action Input: ("url": "current_page_url") in JSON
 # Download pdf using the url link and file name. If user does not provide a file name or format, use a reasonable and concise name.
 Action: download_file_tool
 Action Input: ("url": "current_page_url", "save_as": "Python-Document-1.pdf") in JSON
+# Downloads run in the background, so carry on with the next step. Add "wait": true only if you need the file before continuing.
+
+# Check the progress of downloads by id, or of all downloads with an empty input
+Action: download_status_tool
+Action Input: ""
 
 INSTRUCTIONS:
 {input}
@@ -73,4 +85,58 @@ Scratchpad:
     @classmethod
     def get_system_prompt(cls) -> ChatPromptTemplate:
         """Return the ChatPromptTemplate for Agent interactions."""
-        return ChatPromptTemplate.from_template(cls.BASE_TEMPLATE)
\ No newline at end of file
+        return ChatPromptTemplate.from_template(cls.BASE_TEMPLATE)
+
+
+class ToolCallingPrompt:
+    """System prompt for the native tool-calling Agent."""
+
+    SYSTEM_TEMPLATE = """
+You are an AI automation agent. Complete the user's instructions by calling the tools you have been given.
+
+Your Goal:
+- Follow the user's instructions line by line.
+- Always begin by navigating to the page url.
+- Use fuzzy_fetch_html_tool to find candidate elements for the next action, and choose the best one.
+- When you need several elements from the same page, such as the fields and button of a form, find them with one fuzzy_fetch_batch_tool call, giving the expected tag types where you know them.
+- Use fetch_all_elements_tool only as a last option, at most once per page, and reuse what it returned while you stay on that page.
+- When you click an element you searched for, pass the search text as the click's "description" so the selector is remembered for later runs.
+- Search results may start with a remembered selector that worked on this site before; click it if it fits the results.
+- If a click fails try another way to reach the element, such as its link.
+- Downloads run in the background; set "wait" only if you need the file before continuing.
+- When every instruction is done, reply with a short summary and no tool calls.
+""".strip()
+
+    @classmethod
+    def get_prompt(cls) -> ChatPromptTemplate:
+        """Return the ChatPromptTemplate for tool-calling Agent interactions."""
+        return ChatPromptTemplate.from_messages([
+            ("system", cls.SYSTEM_TEMPLATE),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ])
+
+
+class PlannerPrompt:
+    """Prompt that splits an instruction into independent sub-tasks."""
+
+    BASE_TEMPLATE = """
+You split browser automation instructions into independent sub-tasks that can run at the same time in separate browsers.
+
+Rules:
+- A sub-task must be self-contained: repeat every step it needs, starting from navigating to the first page, with its own values filled in.
+- Only split work that does not depend on the result of other work, e.g. the same steps repeated for several search terms.
+- If the instruction cannot be split, return it unchanged as the only sub-task.
+- Keep file names and other details exactly as the instruction asks.
+
+Reply with JSON only, in this shape:
+{{"subtasks": ["first sub-task instruction", "second sub-task instruction"]}}
+
+INSTRUCTIONS:
+{input}
+""".strip()
+
+    @classmethod
+    def get_prompt(cls) -> ChatPromptTemplate:
+        """Return the ChatPromptTemplate for planning."""
+        return ChatPromptTemplate.from_template(cls.BASE_TEMPLATE)
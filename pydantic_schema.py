@@ -1,9 +1,12 @@
+from typing import List
+
 from pydantic import BaseModel, Field
 
 
 class ClickInput(BaseModel):
     """Input schema for clicking an element."""
     selector: str = Field(..., description="CSS selector of the element to click.")
+    description: str = Field("", description="Short description of the element, e.g. the search text used to find it.")
 
 class NavigateInput(BaseModel):
     """Input schema for navigation."""
@@ -17,9 +20,42 @@ class FuzzySearchInput(BaseModel):
     """Input schema for extracting HTML elements based on a search text."""
     data: str = Field(..., description='A JSON-encoded object with "url" and "search_text".')
 
+class BatchSearchInput(BaseModel):
+    """Input schema for searching several elements of a page at once."""
+    data: str = Field(..., description='A JSON-encoded object with "url" and "queries", a list of phrases or of objects with "text" and optionally "tags".')
+
 class DownloadFileInput(BaseModel):
     """Input schema for downloading a file."""
-    data: str = Field(..., description='A JSON-encoded object containing "url" and "save_as".')
+    data: str = Field(..., description='A JSON-encoded object containing "url", "save_as" and optionally "wait".')
+
+class FuzzySearchArgs(BaseModel):
+    """Typed input for fuzzy element search with native tool calling."""
+    url: str = Field(..., description="URL of the page to search.")
+    search_text: str = Field(..., description="Text describing the element to find.")
+
+class BatchQueryArgs(BaseModel):
+    """One phrase of a batch element search."""
+    text: str = Field(..., description="Text describing the element to find.")
+    tags: List[str] = Field(default_factory=list, description="Expected tag types, e.g. input, button, a or select; empty for any.")
+
+class BatchSearchArgs(BaseModel):
+    """Typed input for batch element search with native tool calling."""
+    url: str = Field(..., description="URL of the page to search.")
+    queries: List[BatchQueryArgs] = Field(..., description="The elements to find.")
+
+class GetAllElementsArgs(BaseModel):
+    """Typed input for extracting all HTML elements with native tool calling."""
+    url: str = Field(..., description="URL of the page to read.")
+
+class DownloadFileArgs(BaseModel):
+    """Typed input for downloading a file with native tool calling."""
+    url: str = Field(..., description="URL of the file to download.")
+    save_as: str = Field("downloaded_file.pdf", description="Local file name to save to.")
+    wait: bool = Field(False, description="Wait for the download to finish before returning.")
+
+class DownloadStatusInput(BaseModel):
+    """Input schema for checking download progress."""
+    job_id: str = Field("", description="Id of the download to check; empty for all downloads.")
 
 class NoInput(BaseModel):
     """Input schema for tools that take no input."""
\ No newline at end of file
@@ -1,10 +1,9 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
+import re
 import json
-import aiohttp
-from bs4 import BeautifulSoup
-from difflib import SequenceMatcher
+import time
 
-from langchain_community.agent_toolkits import PlayWrightBrowserToolkit
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from langchain_core.utils.function_calling import convert_to_openai_function
 from langchain.tools import tool
 
@@ -12,163 +11,312 @@ from pydantic_schema import (
     ClickInput,
     NavigateInput,
     FuzzySearchInput,
+    BatchSearchInput,
     GetAllElementsInput,
     DownloadFileInput,
+    FuzzySearchArgs,
+    BatchSearchArgs,
+    GetAllElementsArgs,
+    DownloadFileArgs,
+    DownloadStatusInput,
     NoInput,
 )
 
-from util.utils import TokenUtils
+from util.element_compressor import ElementCompressor
+from util.dom_snapshot import PageElement, PageSnapshot, SnapshotCache, normalize_url
+from util.matcher import BatchQuery, get_matcher, render_batch_matches
+from util.http_client import HttpClient
+from util.download_manager import DownloadManager
+from util.selector_memory import SelectorMemory
+from util.load_policy import PAGE_WAIT_UNTIL, context_traffic
+from util.tracing import annotate, span, traced_tool
 from util.logging_util import get_logger
 
 logger = get_logger(__name__)
 
+# Matches returned per phrase by the batch search tool
+BATCH_TOP_K = 5
+# Tag types a batch query may be restricted to
+BATCH_TAGS = frozenset(["input", "button", "a", "select", "textarea"])
+# Element searches remembered until a click on their page, to learn what a selector was for
+MAX_PENDING_SEARCHES = 10
+# Matched elements of a search compared with the clicked element
+PENDING_SEARCH_ELEMENTS = 50
+
+# Tag, attributes and whitespace-free text of an element, comparable with a PageElement
+ELEMENT_IDENTITY_JS = """el => ({
+    tag: el.tagName.toLowerCase(),
+    attrs: Object.fromEntries(Array.from(el.attributes, a => [a.name, a.value])),
+    text: el.textContent.replace(/\\s+/g, ""),
+})"""
+
+
+def element_identity(elem: PageElement) -> Tuple[str, Dict[str, str], str]:
+    """Return what ELEMENT_IDENTITY_JS returns for the same element in the browser."""
+    attrs = {name: " ".join(value) if isinstance(value, list) else str(value) for name, value in elem.attrs.items()}
+    return elem.tag, attrs, re.sub(r"\s+", "", elem.text)
+
+
+def parse_batch_queries(queries: List) -> List[BatchQuery]:
+    """Build batch queries from plain phrases, dicts or typed query arguments."""
+    parsed = []
+    for query in queries:
+        if isinstance(query, str):
+            text, tags = query, []
+        elif isinstance(query, dict):
+            text, tags = query.get("text", ""), query.get("tags") or []
+        else:
+            text, tags = query.text, query.tags
+        if isinstance(tags, str):
+            tags = [tags]
+        tags = frozenset(tag.lower() for tag in tags) & BATCH_TAGS
+        if text.strip():
+            parsed.append(BatchQuery(text.strip(), tags or None))
+    return parsed
+
+
+class PageFetchError(Exception):
+    """Raised when a page cannot be fetched for snapshotting."""
+
+    def __init__(self, status: int):
+        self.status = status
+        super().__init__(f"Request failed with status code {status}")
+
 
 class AiTools:
     """All tools available to the Agent for browser automation."""
 
-    def __init__(self, async_browser=None):
+    def __init__(
+        self,
+        async_context=None,
+        http_client: Optional[HttpClient] = None,
+        selector_memory: Optional[SelectorMemory] = None,
+    ):
         """
-        async_browser: An async Playwright browser instance.
+        async_context: An async Playwright browser context leased for this run.
+        http_client: The shared HttpClient used for page fetches and downloads.
+        selector_memory: The shared store of selectors learned in earlier runs, if enabled.
         """
-        if async_browser is None:
-            raise ValueError("async_browser must be provided for Playwright tools.")
-
-        toolkit = PlayWrightBrowserToolkit.from_browser(async_browser=async_browser)
-
-        # Get relevant playwright tools
-        playwright_click_tool = next((t for t in toolkit.get_tools() if t.name == "click_element"), None)
-        playwright_navigate_tool = next((t for t in toolkit.get_tools() if t.name == "navigate_browser"), None)
-        playwright_back_tool = next((t for t in toolkit.get_tools() if t.name == "previous_webpage"), None)
+        if async_context is None:
+            raise ValueError("async_context must be provided for Playwright tools.")
+        if http_client is None:
+            raise ValueError("http_client must be provided for HTTP tools.")
+
+        self.async_context = async_context
+        self.http_client = http_client
+        self.download_manager = DownloadManager(http_client)
+        self.snapshot_cache = SnapshotCache()
+        self.matcher = get_matcher()
+        self.element_compressor = ElementCompressor(max_tokens=10000)
+        # The current user instruction, used to rank elements when compressing
+        self.instruction = ""
+        self.selector_memory = selector_memory
+        # (page url, search text, matched elements) of searches since the last click
+        self.pending_searches: List[Tuple[str, str, List[PageElement]]] = []
+        # Remembered selector -> the description it was offered for
+        self.recalled: Dict[str, str] = {}
+        # Remembered selectors that failed in this run are not offered again
+        self.failed_recalls: set = set()
 
         @tool(args_schema=ClickInput)
-        async def click_element_tool(selector: str) -> str:
+        @traced_tool
+        async def click_element_tool(selector: str, description: str = "") -> str:
             """Click an element by its CSS selector."""
             logger.info(f"click_element_tool called with {selector}")
             try:
-                return await playwright_click_tool._arun(selector)
+                page = await self.current_page()
+                url = page.url
+                self.snapshot_cache.invalidate(url)
+                description = description or await self.describe_selector(page, selector)
+                try:
+                    await page.click(f"{selector} >> visible=1", strict=False, timeout=1000)
+                except PlaywrightTimeoutError:
+                    if selector in self.recalled:
+                        self.failed_recalls.add(selector)
+                    await self.remember_click(url, description, selector, succeeded=False)
+                    return f"Unable to click on element '{selector}'"
+                self.snapshot_cache.invalidate(page.url)
+                await self.remember_click(url, description, selector, succeeded=True)
+                return f"Clicked element '{selector}'"
             except Exception as e:
                 logger.error(f"Error in click_element_tool for selector [{selector}]: {e}")
                 return f"Error clicking element {selector} error: {str(e)}"
 
         @tool(args_schema=NavigateInput)
+        @traced_tool
         async def navigate_tool(url: str) -> str:
             """Navigate into the given URL."""
             logger.info(f"navigate_tool called with {url}")
             url = url.strip().strip('"').strip()
             try:
-                return await playwright_navigate_tool._arun(url)
+                if not url.startswith(("http://", "https://")):
+                    raise ValueError("URL scheme must be 'http' or 'https'")
+                page = await self.current_page()
+                self.snapshot_cache.invalidate(url)
+                traffic = context_traffic(self.async_context)
+                before = traffic.counters() if traffic is not None else None
+                start = time.perf_counter()
+                response = await page.goto(url, wait_until=traffic.policy.wait_until if traffic else PAGE_WAIT_UNTIL)
+                if traffic is not None:
+                    annotate(**traffic.record_navigation(url, (time.perf_counter() - start) * 1000, before))
+                status = response.status if response else "unknown"
+                return f"Navigating to {url} returned status code {status}"
             except Exception as e:
                 logger.error(f"Error in navigate_tool for url [{url}]: {e}")
                 return f"Error navigating to [{url}], error: {e}"
 
         @tool(args_schema=NoInput)
+        @traced_tool
         async def navigate_back_tool() -> str:
             """Navigate back to the previous page."""
             logger.info("navigate_back_tool called.")
             try:
-                return await playwright_back_tool._arun({})
+                page = await self.current_page()
+                traffic = context_traffic(self.async_context)
+                response = await page.go_back(wait_until=traffic.policy.wait_until if traffic else PAGE_WAIT_UNTIL)
+                if response:
+                    return (
+                        f"Navigated back to the previous page with URL '{response.url}'. "
+                        f"Status code {response.status}"
+                    )
+                return "Unable to navigate back; no previous page in the history"
             except Exception:
                 logger.error("Error in navigate_back_tool.")
                 return "Error navigating back"
 
-        @tool(args_schema=FuzzySearchInput)
-        async def fuzzy_fetch_html_tool(data: str) -> str:
-            """Get elements with similarity text ratio >= 0.8, otherwise top 50 elements by ratio."""
-            logger.info(f"fuzzy_fetch_html_tool called with {data}")
-            payload = json.loads(data)
-            url = payload["url"]
-            search_text = payload["search_text"]
+        # The page and download tools share one implementation. The ReAct agent passes their
+        # arguments as a JSON string in "data", native tool calling passes them typed.
+        @traced_tool
+        async def fuzzy_fetch_html_tool(url: str, search_text: str) -> str:
+            logger.info(f"fuzzy_fetch_html_tool called with {url}, {search_text}")
             threshold = 0.8
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    try:
-                        if response.status != 200:
-                            return f"Request failed with status code {response.status}"
-
-                        html = await response.text()
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        matched_elements = []
-                        all_elements = []
-                        search_lower = search_text.lower()
-
-                        for elem in soup.find_all(True):  # All tags
-                            text = elem.get_text(strip=True)
-                            if text:
-                                attrs_string = " ".join([f'{k}="{v}"' for k, v in elem.attrs.items()])
-                                element_string = (
-                                    f"<{elem.name} {attrs_string}>{text}</{elem.name}>"
-                                    if len(text) < 100
-                                    else f"<{elem.name} {attrs_string}>"
-                                )
-                                ratio = SequenceMatcher(None, text.lower(), search_lower).ratio()
-                                all_elements.append((element_string, ratio))
-                                if ratio >= threshold:
-                                    matched_elements.append(element_string)
-
-                        if matched_elements:
-                            return '\n'.join(matched_elements)
-                        else:
-                            sorted_elements = sorted(all_elements, key=lambda x: x[1], reverse=True)[:50]
-                            return '\n'.join([element for element, _ in sorted_elements]) if sorted_elements else "No elements found."
-
-                    except Exception as e:
-                        logger.error(f"Error fetching element with fuzzy_fetch_html_tool, Error: {e}")
-                        return "Error fetching element with fuzzy_fetch_html_tool"
-
-        @tool(args_schema=GetAllElementsInput)
-        async def fetch_all_elements_tool(data: str) -> str:
-            """Get all HTML elements for the given URL (async)."""
-            logger.info(f"fetch_all_elements_tool called with {data}")
-            payload = json.loads(data)
-            url = payload["url"]
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    try:
-                        if response.status != 200:
-                            return f"Request failed with status code {response.status}"
-
-                        html = await response.text()
-                        soup = BeautifulSoup(html, "html.parser")
-
-                        results = []
-                        for elem in soup.find_all(True):  # All tags
-                            text = elem.get_text(strip=True)
-                            attrs_string = " ".join([f'{k}="{v}"' for k, v in elem.attrs.items()])
-                            if text and len(text) < 100:
-                                results.append(f"<{elem.name} {attrs_string}>{text}</{elem.name}>")
-                            else:
-                                results.append(f"<{elem.name} {attrs_string}>")
-                        final_result = '\n'.join(results) if results else "No elements found."
-
-                        return TokenUtils.truncate_to_10000_tokens(final_result)
-                    except Exception as e:
-                        logger.error(f"Error fetching elements in fetch_all_elements_tool, Error:{e}")
-                        return "Error fetching elements with fetch_all_elements_tool"
-
-        @tool(args_schema=DownloadFileInput)
-        async def download_file_tool(data: str) -> str:
-            """Async download a file from a given URL and save it to a local path."""
-            logger.info(f"download_file_tool called with {data}")
-            payload = json.loads(data)
-            url = payload["url"]
-            save_as = payload.get("save_as", "downloaded_file.pdf")
+            try:
+                remembered = await self.recall_selectors(url, [search_text])
+                snapshot = await self.page_snapshot(url)
+
+                with span("fuzzy_match", engine=self.matcher.name, elements=len(snapshot.elements)):
+                    elements = self.matcher.match(snapshot, search_text, threshold=threshold, top_k=50)
+                self.note_search(url, search_text, elements)
+                found = '\n'.join([elem.element_string for elem in elements]) if elements else "No elements found."
+                if remembered:
+                    # A hint only; the search results stay, in case the remembered entry is wrong
+                    found = (
+                        f"Remembered selector for '{search_text}' on this page: {remembered[search_text]} "
+                        "(worked in earlier runs and is visible now). Matching elements:\n" + found
+                    )
+                return found
+
+            except PageFetchError as e:
+                return str(e)
+            except Exception as e:
+                logger.error(f"Error fetching element with fuzzy_fetch_html_tool, Error: {e}")
+                return "Error fetching element with fuzzy_fetch_html_tool"
+
+        @traced_tool
+        async def fuzzy_fetch_batch_tool(url: str, queries: List[BatchQuery]) -> str:
+            logger.info(f"fuzzy_fetch_batch_tool called with {url}, {[query.text for query in queries]}")
+            try:
+                remembered = await self.recall_selectors(url, [query.text for query in queries])
+                lines = [f'"{text}": {selector}' for text, selector in remembered.items()]
+                if lines:
+                    lines = ["Remembered selectors (worked in earlier runs and are visible now):"] + lines + [""]
+                snapshot = await self.page_snapshot(url)
+
+                with span("fuzzy_match_batch", engine=self.matcher.name, elements=len(snapshot.elements), queries=len(queries)):
+                    results = self.matcher.match_batch(snapshot, queries, top_k=BATCH_TOP_K)
+                for query, matches in zip(queries, results):
+                    self.note_search(url, query.text, [elem for elem, _ in matches])
+                return "\n".join(lines) + render_batch_matches(queries, results)
+
+            except PageFetchError as e:
+                return str(e)
+            except Exception as e:
+                logger.error(f"Error fetching elements with fuzzy_fetch_batch_tool, Error: {e}")
+                return "Error fetching elements with fuzzy_fetch_batch_tool"
+
+        @traced_tool
+        async def fetch_all_elements_tool(url: str) -> str:
+            logger.info(f"fetch_all_elements_tool called with {url}")
+            try:
+                snapshot = await self.page_snapshot(url)
 
+                with span("compress_elements", elements=len(snapshot.elements)):
+                    return self.element_compressor.compress(snapshot.elements, self.instruction)
+            except PageFetchError as e:
+                return str(e)
+            except Exception as e:
+                logger.error(f"Error fetching elements in fetch_all_elements_tool, Error:{e}")
+                return "Error fetching elements with fetch_all_elements_tool"
+
+        @traced_tool
+        async def download_file_tool(url: str, save_as: str = "downloaded_file.pdf", wait: bool = False) -> str:
+            logger.info(f"download_file_tool called with {url}, {save_as}")
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as response:
-                        if response.status != 200:
-                            return f"Failed with status code {response.status}"
-                        with open(save_as, "wb") as f:
-                            async for chunk in response.content.iter_chunked(8192):
-                                f.write(chunk)
-                return f"File saved as {save_as}"
+                job = self.download_manager.submit(url, save_as)
+                if wait:
+                    job = await self.download_manager.wait(job.id)
+                    if job.status == "failed":
+                        return f"Error downloading file: {job.error}"
+                    return f"File saved as {save_as}"
+                return f"Download [{job.id}] started, saving as {save_as}. Check it with download_status_tool."
             except Exception as e:
                 logger.error(f"In download_file_tool, an error occured. Error:{e}")
                 return f"Error downloading file: {e}"
 
+        @tool("fuzzy_fetch_html_tool", args_schema=FuzzySearchInput)
+        async def fuzzy_fetch_html_json(data: str) -> str:
+            """Get elements with similarity text ratio >= 0.8, otherwise top 50 elements by ratio."""
+            payload = json.loads(data)
+            return await fuzzy_fetch_html_tool(payload["url"], payload["search_text"])
+
+        @tool("fuzzy_fetch_batch_tool", args_schema=BatchSearchInput)
+        async def fuzzy_fetch_batch_json(data: str) -> str:
+            """Find several elements of a page in one call; returns the top matches per phrase."""
+            payload = json.loads(data)
+            return await fuzzy_fetch_batch_tool(payload["url"], parse_batch_queries(payload["queries"]))
+
+        @tool("fetch_all_elements_tool", args_schema=GetAllElementsInput)
+        async def fetch_all_elements_json(data: str) -> str:
+            """Get all HTML elements for the given URL (async)."""
+            payload = json.loads(data)
+            return await fetch_all_elements_tool(payload["url"])
+
+        @tool("download_file_tool", args_schema=DownloadFileInput)
+        async def download_file_json(data: str) -> str:
+            """Start downloading a file from a given URL to a local path in the background."""
+            payload = json.loads(data)
+            return await download_file_tool(
+                payload["url"], payload.get("save_as", "downloaded_file.pdf"), bool(payload.get("wait"))
+            )
+
+        @tool("fuzzy_fetch_html_tool", args_schema=FuzzySearchArgs)
+        async def fuzzy_fetch_html_typed(url: str, search_text: str) -> str:
+            """Get elements of the page at url whose text is similar to search_text (top 50)."""
+            return await fuzzy_fetch_html_tool(url, search_text)
+
+        @tool("fuzzy_fetch_batch_tool", args_schema=BatchSearchArgs)
+        async def fuzzy_fetch_batch_typed(url: str, queries: List[dict]) -> str:
+            """Find several elements of the page at url in one call; returns the top matches per query."""
+            return await fuzzy_fetch_batch_tool(url, parse_batch_queries(queries))
+
+        @tool("fetch_all_elements_tool", args_schema=GetAllElementsArgs)
+        async def fetch_all_elements_typed(url: str) -> str:
+            """Get all HTML elements of the page at url, most relevant first."""
+            return await fetch_all_elements_tool(url)
+
+        @tool("download_file_tool", args_schema=DownloadFileArgs)
+        async def download_file_typed(url: str, save_as: str = "downloaded_file.pdf", wait: bool = False) -> str:
+            """Start downloading a file from a given URL to a local path in the background."""
+            return await download_file_tool(url, save_as, wait)
+
+        @tool(args_schema=DownloadStatusInput)
+        @traced_tool
+        async def download_status_tool(job_id: str = "") -> str:
+            """Report the progress of background downloads."""
+            logger.info(f"download_status_tool called with {job_id}")
+            return self.download_manager.status(job_id.strip().strip('"'))
+
         # Define playwright tools
         self.playwright_tools = [
             click_element_tool,
@@ -177,23 +325,139 @@ class AiTools:
         ]
 
         # Define custom tools
-        self.fuzzy_fetch_html_tool = fuzzy_fetch_html_tool
-        self.fetch_all_elements_tool = fetch_all_elements_tool
-        self.download_file_tool = download_file_tool
-
-    def ai_tools(self, return_tool: bool = False) -> List:
+        self.fuzzy_fetch_html_tool = fuzzy_fetch_html_json
+        self.fuzzy_fetch_batch_tool = fuzzy_fetch_batch_json
+        self.fetch_all_elements_tool = fetch_all_elements_json
+        self.download_file_tool = download_file_json
+        self.download_status_tool = download_status_tool
+
+        # Variants with typed arguments for native tool calling
+        self.typed_tools = [fuzzy_fetch_html_typed, fuzzy_fetch_batch_typed, fetch_all_elements_typed, download_file_typed]
+
+    async def recall_selectors(self, url: str, descriptions: List[str]) -> Dict[str, str]:
+        """Return remembered selectors, visible on the open page showing the URL, by description."""
+        if self.selector_memory is None:
+            return {}
+        page = self.live_page(url)
+        if page is None:
+            return {}
+        remembered = {}
+        for description in descriptions:
+            selector = await self.selector_memory.lookup(page, description, exclude=frozenset(self.failed_recalls))
+            if selector is not None:
+                remembered[description] = selector
+                self.recalled[selector] = description
+        annotate(selector_memory_hits=len(remembered))
+        return remembered
+
+    def note_search(self, url: str, search_text: str, elements: List[PageElement]) -> None:
+        """Keep a search until the next click on its page, to learn what the clicked selector was for."""
+        self.pending_searches.append((url, search_text, elements[:PENDING_SEARCH_ELEMENTS]))
+        del self.pending_searches[:-MAX_PENDING_SEARCHES]
+
+    async def describe_selector(self, page, selector: str) -> str:
+        """Return the search text of the one recent search on the page that returned the element the selector picks.
+
+        The element must equal a search result in tag, attributes and text. If no
+        search, or several different ones, returned it, nothing is learned.
+        """
+        if selector in self.recalled:
+            return self.recalled[selector]
+        searches = [search for search in self.pending_searches if normalize_url(search[0]) == normalize_url(page.url)]
+        if not searches:
+            return ""
+        try:
+            found = await page.locator(f"{selector} >> visible=1").first.evaluate(ELEMENT_IDENTITY_JS, timeout=1000)
+        except Exception:
+            return ""
+        clicked = (found["tag"], found["attrs"], found["text"])
+        matches = {
+            search_text
+            for _, search_text, elements in searches
+            if any(element_identity(elem) == clicked for elem in elements)
+        }
+        return matches.pop() if len(matches) == 1 else ""
+
+    async def remember_click(self, url: str, description: str, selector: str, succeeded: bool) -> None:
+        if self.selector_memory is None or not description:
+            return
+        try:
+            await self.selector_memory.record(url, description, selector, succeeded)
+        except Exception as e:
+            logger.warning(f"Unable to record selector [{selector}] in the selector memory: {e}")
+        if succeeded:
+            # The page has changed, so earlier searches no longer describe it
+            self.pending_searches = [search for search in self.pending_searches if normalize_url(search[0]) != normalize_url(url)]
+
+    async def page_snapshot(self, url: str) -> PageSnapshot:
+        """Return the cached snapshot for the URL, reading or fetching it on a miss.
+
+        Pages open in the browser are read from the rendered DOM, so JS content
+        and session state are included. Other URLs are fetched over HTTP.
+        """
+        snapshot = self.snapshot_cache.get(url)
+        annotate(cache_hit=snapshot is not None)
+        if snapshot is not None:
+            return snapshot
+
+        with span("live_page_content", kind="browser"):
+            html = await self.live_page_html(url)
+        annotate(source="browser" if html is not None else "http")
+        if html is None:
+            with span("http_get", kind="http", url=url) as current:
+                status, html = await self.http_client.get_text(url)
+                if current is not None:
+                    current.set(status=status, response_bytes=len(html))
+            if status != 200:
+                raise PageFetchError(status)
+        with span("html_parse", html_bytes=len(html)):
+            return self.snapshot_cache.put(url, html)
+
+    def live_page(self, url: str):
+        """Return the open page showing the URL, if any."""
+        target = normalize_url(url)
+        for page in reversed(self.async_context.pages):
+            if normalize_url(page.url) == target:
+                return page
+        return None
+
+    async def live_page_html(self, url: str) -> Optional[str]:
+        """Return the rendered HTML of the open page showing the URL, if any."""
+        page = self.live_page(url)
+        if page is None:
+            return None
+        try:
+            return await page.content()
+        except Exception as e:
+            logger.warning(f"Unable to read rendered page [{url}], falling back to HTTP: {e}")
+            return None
+
+    async def current_page(self):
+        """Return the active page of the leased context, opening one if needed."""
+        if not self.async_context.pages:
+            return await self.async_context.new_page()
+        return self.async_context.pages[-1]
+
+    def ai_tools(self, return_tool: bool = False, typed: bool = False) -> List:
         """Return the available tools.
 
         Args:
             return_tool (bool): If True, return instances of tools for the agent.
                                 If False, return OpenAI-style tool definitions.
+            typed (bool): If True, page and download tools take typed arguments
+                          instead of a JSON string, for native tool calling.
         """
         # Get playwright tools
         tools = [t for t in self.playwright_tools]
 
         # Append custom tools
-        tools.append(self.fuzzy_fetch_html_tool)
-        tools.append(self.fetch_all_elements_tool)
-        tools.append(self.download_file_tool)
+        if typed:
+            tools.extend(self.typed_tools)
+        else:
+            tools.append(self.fuzzy_fetch_html_tool)
+            tools.append(self.fuzzy_fetch_batch_tool)
+            tools.append(self.fetch_all_elements_tool)
+            tools.append(self.download_file_tool)
+        tools.append(self.download_status_tool)
 
         return tools if return_tool else [convert_to_openai_function(t) for t in tools]
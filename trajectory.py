@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from difflib import SequenceMatcher
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from uuid import UUID
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Replay settings
+TRAJECTORY_REPLAY = os.getenv("TRAJECTORY_REPLAY", "true").lower() not in ("0", "false", "no")
+MACRO_DB_PATH = os.getenv("MACRO_DB_PATH", "macros.db")
+
+# Tools that only read the page; the LLM uses them to decide, a replay does not need them
+READ_ONLY_TOOLS = frozenset(["fuzzy_fetch_html_tool", "fuzzy_fetch_batch_tool", "fetch_all_elements_tool", "download_status_tool"])
+
+# Tool observations that mean the step did not do what it was asked to
+FAILURE_PREFIXES = ("Error", "Unable", "Failed", "Request failed", "No elements found")
+
+# Instruction tokens: words, keeping hyphenated names such as Python-Document-1 together
+TOKEN_PATTERN = re.compile(r"\w[\w\-]*")
+# Scheme, host and path of a URL; values are only lifted from its query string
+URL_BASE_PATTERN = re.compile(r"(https?://[^\s\"'?#]*)")
+URL_PATTERN = re.compile(r"https?://\S+")
+# A navigation whose page answered with an error status
+ERROR_STATUS_PATTERN = re.compile(r"returned status code [45]\d\d")
+# A download that was only queued; whether it worked is known once it finishes
+PENDING_DOWNLOAD_PATTERN = re.compile(r"^Download \[(\w+)\] started")
+# URL parts that tell nothing about which page element a step used
+GENERIC_TOKENS = frozenset(["http", "https", "www"])
+
+logger = get_logger(__name__)
+
+
+def step_failed(observation: Any) -> bool:
+    """Return True if a tool observation does not show that the step did what it was asked to.
+
+    Navigations to error pages fail, and so do downloads that were only queued.
+    """
+    text = str(observation).strip()
+    return (
+        text.startswith(FAILURE_PREFIXES)
+        or ERROR_STATUS_PATTERN.search(text) is not None
+        or pending_download(text) is not None
+    )
+
+
+def pending_download(observation: Any) -> Optional[str]:
+    """Return the job id of a download the observation reports as queued."""
+    match = PENDING_DOWNLOAD_PATTERN.match(str(observation).strip())
+    return match.group(1) if match else None
+
+
+def _tokens(text: str) -> set:
+    return set(TOKEN_PATTERN.findall(text))
+
+
+def _replace_word(text: str, old: str, new: str) -> str:
+    """Replace whole-word occurrences of a value outside URL schemes, hosts and paths."""
+    parts = URL_BASE_PATTERN.split(text)
+    # Odd parts are URL bases captured by the split
+    return "".join(
+        part if i % 2 else re.sub(rf"(?<!\w){re.escape(old)}(?!\w)", lambda _: new, part)
+        for i, part in enumerate(parts)
+    )
+
+
+def _lift(text: str, value: str, index: int) -> str:
+    """Replace a value, and its lower-case form as used in URLs, with placeholders."""
+    text = _replace_word(text, value, f"{{{{p{index}}}}}")
+    return _replace_word(text, value.lower(), f"{{{{p{index}|lower}}}}")
+
+
+def _shape(instruction: str) -> str:
+    """Hash of what two instructions must share for one macro to fit both: text between tokens and token count."""
+    skeleton = [TOKEN_PATTERN.sub("", instruction).split(), len(TOKEN_PATTERN.findall(instruction))]
+    return hashlib.sha1(json.dumps(skeleton).encode("utf-8")).hexdigest()
+
+
+class TrajectoryRecorder(AsyncCallbackHandler):
+    """Collect the tool calls of a run and whether each one succeeded."""
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        # Tool run id -> step; tool calls of one turn may run, and finish, concurrently
+        self._running: Dict[UUID, Dict[str, Any]] = {}
+
+    async def on_agent_action(self, action, **kwargs) -> None:
+        self.steps.append({
+            "tool": action.tool, "tool_input": action.tool_input, "ok": None, "started": False, "observation": "",
+        })
+
+    async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs) -> None:
+        name = (serialized or {}).get("name")
+        for step in self.steps:
+            if not step["started"] and step["tool"] == name:
+                step["started"] = True
+                self._running[run_id] = step
+                return
+
+    async def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs) -> None:
+        step = self._running.pop(run_id, None)
+        if step is not None:
+            step["observation"] = str(output)
+            step["download_id"] = pending_download(output)
+            step["ok"] = not step_failed(output)
+
+    async def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        step = self._running.pop(run_id, None)
+        if step is not None:
+            step["ok"] = False
+
+    def successful_actions(self, download_done: Optional[Callable[[str], bool]] = None) -> List[Dict[str, Any]]:
+        """Return the steps that succeeded, in order, with their observations.
+
+        Queued downloads count as successful only if download_done(job_id) says
+        they finished.
+        """
+        actions = []
+        for step in self.steps:
+            ok = step["ok"]
+            if step.get("download_id") and download_done is not None:
+                ok = download_done(step["download_id"])
+            if ok:
+                actions.append({"tool": step["tool"], "tool_input": step["tool_input"], "observation": step["observation"]})
+        return actions
+
+
+class Macro:
+    """A replayable tool-call sequence with the instruction values it depends on lifted out."""
+
+    def __init__(self, instruction: str, steps: List[Dict[str, Any]], params: List[str], replays: int = 0, failures: int = 0):
+        self.instruction = instruction
+        self.steps = steps
+        self.params = params
+        self.replays = replays
+        self.failures = failures
+
+    @classmethod
+    def from_recording(cls, instruction: str, actions: List[Dict[str, Any]]) -> "Macro":
+        """Build a macro from the successful steps of a run.
+
+        Instruction tokens that appear in a tool input become parameters; tokens of
+        URLs given in the instruction are fixed parts of the site and stay as they are.
+        Values read from the page, such as the id of a chosen search result, cannot be
+        replayed blind. A step whose input uses them gets a check: the read-only lookup
+        that showed them is run again on replay, and the values must still be on one
+        line of its result.
+        """
+        changing = [action for action in actions if action["tool"] not in READ_ONLY_TOOLS]
+        serialized = json.dumps([action["tool_input"] for action in changing])
+        params = []
+        for token in dict.fromkeys(TOKEN_PATTERN.findall(URL_PATTERN.sub(" ", instruction))):
+            if _lift(serialized, token, 0) != serialized:
+                params.append(token)
+
+        def template(action: Dict[str, Any]) -> str:
+            tool_input = json.dumps(action["tool_input"])
+            for index, value in enumerate(params):
+                tool_input = _lift(tool_input, value, index)
+            return tool_input
+
+        steps: List[Dict[str, Any]] = []
+        known = _tokens(instruction) | GENERIC_TOKENS
+        lookup: Optional[Dict[str, Any]] = None
+        for action in actions:
+            if action["tool"] in READ_ONLY_TOOLS:
+                lookup = action
+                continue
+            tool_input = json.dumps(action["tool_input"])
+            step = {"tool": action["tool"], "template": template(action)}
+            if lookup is not None:
+                evidence = (_tokens(tool_input) - known) & _tokens(str(lookup.get("observation", "")))
+                if evidence:
+                    steps.append({"tool": lookup["tool"], "template": template(lookup), "lookup": True})
+                    step["evidence"] = sorted(evidence)
+            steps.append(step)
+            known |= _tokens(tool_input)
+        return cls(instruction, steps, params)
+
+    @property
+    def shape(self) -> str:
+        return _shape(self.instruction)
+
+    @property
+    def site(self) -> str:
+        """Host of the first page the macro navigates to."""
+        for tool_name, tool_input, _ in self.render({}):
+            if tool_name == "navigate_tool":
+                return urlparse(str(tool_input).strip()).netloc
+        return ""
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the instruction with its parameter values masked, plus the site."""
+        skeleton = self.instruction
+        for index, value in enumerate(self.params):
+            skeleton = _lift(skeleton, value, index)
+        return hashlib.sha1(f"{self.site}\n{skeleton}".encode("utf-8")).hexdigest()
+
+    def bind(self, instruction: str) -> Optional[Dict[str, str]]:
+        """Map parameters to the values of a new instruction, or None if it does not fit this macro.
+
+        The instructions may only differ by substituted tokens, and every substituted
+        token must be one of the lifted parameters.
+        """
+        old_tokens = TOKEN_PATTERN.findall(self.instruction)
+        new_tokens = TOKEN_PATTERN.findall(instruction)
+        if TOKEN_PATTERN.sub("", self.instruction).split() != TOKEN_PATTERN.sub("", instruction).split():
+            return None
+
+        bindings = {value: value for value in self.params}
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, old_tokens, new_tokens, autojunk=False).get_opcodes():
+            if tag == "equal":
+                continue
+            if tag != "replace" or i2 - i1 != j2 - j1:
+                return None
+            for old, new in zip(old_tokens[i1:i2], new_tokens[j1:j2]):
+                if old not in bindings or bindings[old] not in (old, new):
+                    return None
+                bindings[old] = new
+        return bindings
+
+    def render(self, bindings: Dict[str, str]) -> List[Tuple[str, Any, Dict[str, Any]]]:
+        """Return (tool, tool_input, step) triples with parameters filled in."""
+        rendered = []
+        for step in self.steps:
+            text = step["template"]
+            for index, value in enumerate(self.params):
+                # Dump the value so quotes and backslashes stay valid inside the JSON template
+                new = bindings.get(value, value)
+                text = text.replace(f"{{{{p{index}}}}}", json.dumps(new)[1:-1])
+                text = text.replace(f"{{{{p{index}|lower}}}}", json.dumps(new.lower())[1:-1])
+            rendered.append((step["tool"], json.loads(text), step))
+        return rendered
+
+
+class MacroStore:
+    """SQLite store of macros keyed by instruction/site fingerprint."""
+
+    def __init__(self, path: str = MACRO_DB_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS macros (
+                    fingerprint TEXT PRIMARY KEY,
+                    instruction TEXT NOT NULL,
+                    shape TEXT NOT NULL,
+                    steps TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    replays INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS macros_shape ON macros (shape)")
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def save(self, macro: Macro) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT OR REPLACE INTO macros "
+            "(fingerprint, instruction, steps, params, replays, failures, updated_at, shape) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                macro.fingerprint, macro.instruction, json.dumps(macro.steps), json.dumps(macro.params),
+                macro.replays, macro.failures, time.time(), macro.shape,
+            ),
+        )
+
+    async def find(self, instruction: str) -> Optional[Tuple[Macro, Dict[str, str]]]:
+        """Return the most replayed macro that fits the instruction, with its bindings.
+
+        Only macros of the same shape can fit, so just those are read, through an index.
+        """
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT instruction, steps, params, replays, failures FROM macros WHERE shape = ? "
+            "ORDER BY replays - failures DESC",
+            (_shape(instruction),),
+        )
+        for row in rows:
+            macro = Macro(row[0], json.loads(row[1]), json.loads(row[2]), row[3], row[4])
+            bindings = macro.bind(instruction)
+            if bindings is not None:
+                return macro, bindings
+        return None
+
+    async def record_outcome(self, macro: Macro, succeeded: bool) -> None:
+        column = "replays" if succeeded else "failures"
+        await asyncio.to_thread(
+            self._execute,
+            f"UPDATE macros SET {column} = {column} + 1 WHERE fingerprint = ?",
+            (macro.fingerprint,),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MacroReplayer:
+    """Run a macro directly against the tools, stopping at the first failed step."""
+
+    def __init__(self, tools: List):
+        self.tools = {t.name: t for t in tools}
+
+    async def replay(self, macro: Macro, bindings: Dict[str, str]) -> Tuple[bool, List[Dict[str, Any]]]:
+        """Return whether every step succeeded, and the steps that did, with their observations.
+
+        Lookups are run again, and a step that uses values read from the page stops the
+        replay unless those values are still on one line of the lookup's new result.
+        Downloads are awaited, so a replay only succeeds once its files are saved.
+        """
+        done = []
+        lookup_lines: List[set] = []
+        for tool_name, tool_input, step in macro.render(bindings):
+            if tool_name not in self.tools:
+                logger.info(f"Replay stopped, unknown tool {tool_name}")
+                return False, done
+            evidence = set(step.get("evidence", []))
+            if evidence and not any(evidence <= line for line in lookup_lines):
+                logger.info(f"Replay stopped, {sorted(evidence)} from the recorded page is not on the live page")
+                return False, done
+            if tool_name == "download_file_tool":
+                tool_input = _with_wait(tool_input)
+            try:
+                observation = await self.tools[tool_name].ainvoke(tool_input)
+            except Exception as e:
+                observation = f"Error: {e}"
+            if step_failed(observation):
+                logger.info(f"Replay step {tool_name}({tool_input}) failed: {observation}")
+                return False, done
+            if step.get("lookup"):
+                lookup_lines = [_tokens(line) for line in str(observation).splitlines()]
+            done.append({"tool": tool_name, "tool_input": tool_input, "observation": str(observation)})
+        return True, done
+
+
+def _with_wait(tool_input: Any) -> Any:
+    """Ask download_file_tool to wait for the file, for typed and JSON-string inputs."""
+    if isinstance(tool_input, dict):
+        return {**tool_input, "wait": True}
+    try:
+        payload = json.loads(tool_input)
+    except (TypeError, ValueError):
+        return tool_input
+    if not isinstance(payload, dict):
+        return tool_input
+    return json.dumps({**payload, "wait": True})
@@ -0,0 +1,166 @@
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urldefrag
+
+from bs4 import BeautifulSoup
+from bs4.element import CData, NavigableString, Tag
+
+from util.logging_util import get_logger
+
+logger = get_logger(__name__)
+
+# Elements with text at least this long are serialized as an opening tag only
+MAX_INLINE_TEXT = 100
+
+# String types get_text() collects for ordinary tags
+DEFAULT_STRING_TYPES = (NavigableString, CData)
+
+# Tags whose get_text() collects their own string types (Script, Stylesheet, ...)
+STRING_CONTAINER_TAGS = frozenset(["script", "style", "template", "rt", "rp"])
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for page comparisons by dropping the fragment and trailing slash."""
+    return urldefrag(url.strip())[0].rstrip("/")
+
+
+class PageElement:
+    """A single flattened HTML element."""
+
+    __slots__ = ("tag", "attrs", "text", "element_string")
+
+    def __init__(self, tag: str, attrs: Dict, text: str):
+        self.tag = tag
+        self.attrs = attrs
+        self.text = text
+        attrs_string = " ".join([f'{k}="{v}"' for k, v in attrs.items()])
+        self.element_string = (
+            f"<{tag} {attrs_string}>{text}</{tag}>"
+            if text and len(text) < MAX_INLINE_TEXT
+            else f"<{tag} {attrs_string}>"
+        )
+
+
+def flatten_elements(soup: BeautifulSoup) -> List[PageElement]:
+    """Flatten every tag in document order, matching elem.get_text(strip=True).
+
+    Calling get_text() on each tag re-walks the whole subtree of every ancestor.
+    Instead, tags are visited in reverse document order so each tag's text is
+    joined from its direct children, whose text is already known.
+    """
+    tags = soup.find_all(True)  # All tags, in document order
+    texts: Dict[int, str] = {}
+
+    for elem in reversed(tags):
+        parts = []
+        for child in elem.contents:
+            if isinstance(child, Tag):
+                child_text = texts[id(child)]
+                if child_text:
+                    parts.append(child_text)
+            elif type(child) in DEFAULT_STRING_TYPES:
+                stripped = child.strip()
+                if stripped:
+                    parts.append(stripped)
+        texts[id(elem)] = "".join(parts)
+
+    return [
+        PageElement(
+            elem.name,
+            elem.attrs,
+            elem.get_text(strip=True) if elem.name in STRING_CONTAINER_TAGS else texts[id(elem)],
+        )
+        for elem in tags
+    ]
+
+
+class PageSnapshot:
+    """The flattened element list of one page, parsed once."""
+
+    def __init__(self, url: str, content_hash: str, elements: List[PageElement]):
+        self.url = url
+        self.content_hash = content_hash
+        self.elements = elements
+        self.created_at = time.monotonic()
+        # Search indexes built lazily by matcher engines, keyed by engine
+        self.match_indexes: Dict = {}
+        self._text_elements: Optional[List[PageElement]] = None
+
+    @staticmethod
+    def hash_content(html: str) -> str:
+        """Return a stable hash of the page HTML."""
+        return hashlib.sha1(html.encode("utf-8", errors="replace")).hexdigest()
+
+    @classmethod
+    def from_html(cls, url: str, html: str, content_hash: Optional[str] = None) -> "PageSnapshot":
+        """Parse the HTML and flatten every tag into a PageElement."""
+        soup = BeautifulSoup(html, "html.parser")
+        return cls(url, content_hash or cls.hash_content(html), flatten_elements(soup))
+
+    def text_elements(self) -> List[PageElement]:
+        """Return only the elements that contain text."""
+        if self._text_elements is None:
+            self._text_elements = [elem for elem in self.elements if elem.text]
+        return self._text_elements
+
+
+class SnapshotCache:
+    """Per-run page snapshot cache keyed by URL and content hash, with TTL and LRU eviction."""
+
+    def __init__(self, max_entries: int = 16, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._by_url: Dict[str, str] = {}
+        self._by_hash: "OrderedDict[str, PageSnapshot]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[PageSnapshot]:
+        """Return the cached snapshot for a URL, or None if missing or expired."""
+        url = normalize_url(url)
+        content_hash = self._by_url.get(url)
+        snapshot = self._by_hash.get(content_hash) if content_hash else None
+        if snapshot is None:
+            self.misses += 1
+            return None
+        if time.monotonic() - snapshot.created_at > self.ttl_seconds:
+            self.invalidate(url)
+            self.misses += 1
+            return None
+        self._by_hash.move_to_end(content_hash)
+        self.hits += 1
+        return snapshot
+
+    def put(self, url: str, html: str) -> PageSnapshot:
+        """Store the page under its URL, reusing an existing parse of identical content."""
+        url = normalize_url(url)
+        content_hash = PageSnapshot.hash_content(html)
+        snapshot = self._by_hash.get(content_hash)
+        if snapshot is None:
+            snapshot = PageSnapshot.from_html(url, html, content_hash)
+            self._by_hash[content_hash] = snapshot
+        else:
+            snapshot.created_at = time.monotonic()
+            self._by_hash.move_to_end(content_hash)
+        self._by_url[url] = content_hash
+        self._evict()
+        return snapshot
+
+    def invalidate(self, url: Optional[str] = None) -> None:
+        """Drop the snapshot for a URL, or every snapshot when no URL is given."""
+        if url is None:
+            self._by_url.clear()
+            self._by_hash.clear()
+            return
+        content_hash = self._by_url.pop(normalize_url(url), None)
+        if content_hash is not None and content_hash not in self._by_url.values():
+            self._by_hash.pop(content_hash, None)
+
+    def _evict(self) -> None:
+        while len(self._by_hash) > self.max_entries:
+            content_hash, snapshot = self._by_hash.popitem(last=False)
+            for url in [u for u, h in self._by_url.items() if h == content_hash]:
+                del self._by_url[url]
+            logger.info(f"Evicted page snapshot for {snapshot.url}")
@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from util.http_client import HttpClient
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Content hashes of finished downloads, shared by every run and process
+DOWNLOAD_INDEX_PATH = os.getenv("DOWNLOAD_INDEX_PATH", "downloads.db")
+# Seconds a download without ETag or Last-Modified is reused before the URL is fetched again
+DOWNLOAD_INDEX_TTL = float(os.getenv("DOWNLOAD_INDEX_TTL", str(24 * 3600)))
+
+logger = get_logger(__name__)
+
+# Write sizes grow from MIN to MAX as a download keeps going
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+_shared_index: Optional["DownloadIndex"] = None
+_shared_index_lock = threading.Lock()
+
+
+class IndexedFile(NamedTuple):
+    """A finished download that still holds the content a URL returned."""
+
+    path: str
+    sha256: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    updated_at: float
+
+
+class DownloadIndex:
+    """SQLite index of finished downloads: the content hash and validators each URL returned, and where files of each hash are.
+
+    A URL downloaded before, by any run, is revalidated with a conditional request
+    and copied from a file that still has its recorded hash if it has not changed.
+    """
+
+    def __init__(self, path: str = DOWNLOAD_INDEX_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS files_url ON files (url)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+
+    @classmethod
+    def shared(cls) -> "DownloadIndex":
+        """Return the index of this process, opening it on first use."""
+        global _shared_index
+        with _shared_index_lock:
+            if _shared_index is None:
+                _shared_index = cls()
+            return _shared_index
+
+    def find(self, url: str) -> Optional[IndexedFile]:
+        """Return a file that still holds the content the URL last returned, with that response's validators."""
+        with self._lock, self._conn:
+            latest = self._conn.execute(
+                "SELECT sha256, etag, last_modified, updated_at FROM files WHERE url = ? ORDER BY updated_at DESC LIMIT 1",
+                (url,),
+            ).fetchone()
+            if latest is None:
+                return None
+            sha256, etag, last_modified, updated_at = latest
+            rows = self._conn.execute(
+                "SELECT path, size FROM files WHERE sha256 = ? ORDER BY url = ? DESC, updated_at DESC",
+                (sha256, url),
+            ).fetchall()
+        for path, size in rows:
+            if _sha256_file(path) == sha256:
+                return IndexedFile(path, sha256, size, etag, last_modified, updated_at)
+            self.forget(path)
+        return None
+
+    def add(
+        self, path: str, url: str, sha256: str, size: int,
+        etag: Optional[str] = None, last_modified: Optional[str] = None,
+    ) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), url, sha256, size, etag, last_modified, time.time()),
+            )
+
+    def forget(self, path: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class DownloadJob:
+    """State of a single download, as reported to the agent."""
+
+    def __init__(self, url: str, save_as: str):
+        self.id = uuid.uuid4().hex[:8]
+        self.url = url
+        self.save_as = save_as
+        self.status = "queued"
+        self.bytes_done = 0
+        self.total_bytes: Optional[int] = None
+        self.sha256: Optional[str] = None
+        # Validators of the response, used to revalidate and resume later downloads of the URL
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def describe(self) -> str:
+        """Return a one-line status summary."""
+        total = f"/{self.total_bytes}" if self.total_bytes else ""
+        line = f"[{self.id}] {self.status}: {self.url} -> {self.save_as} ({self.bytes_done}{total} bytes)"
+        if self.error:
+            line += f" error: {self.error}"
+        return line
+
+
+class DownloadManager:
+    """Runs downloads in the background with bounded concurrency, resume and content-hash dedup."""
+
+    def __init__(self, http_client: HttpClient, max_concurrent: int = 3, index: Optional[DownloadIndex] = None):
+        self.http_client = http_client
+        self.max_concurrent = max_concurrent
+        self.jobs: Dict[str, DownloadJob] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.index = index or DownloadIndex.shared()
+
+    def submit(self, url: str, save_as: str) -> DownloadJob:
+        """Queue a download and return its job immediately."""
+        for job in self.jobs.values():
+            if job.url == url and job.save_as == save_as and job.status in ("queued", "running", "done"):
+                return job
+
+        job = DownloadJob(url, save_as)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def status(self, job_id: str = "") -> str:
+        """Return the status of one job, or of every job when no id is given."""
+        if job_id:
+            job = self.jobs.get(job_id)
+            return job.describe() if job else f"No download with id [{job_id}]"
+        if not self.jobs:
+            return "No downloads started."
+        return "\n".join(job.describe() for job in self.jobs.values())
+
+    async def wait(self, job_id: str) -> DownloadJob:
+        """Wait for one job to finish and return it."""
+        job = self.jobs[job_id]
+        if job.task is not None:
+            await asyncio.gather(job.task, return_exceptions=True)
+        return job
+
+    async def wait_all(self) -> List[DownloadJob]:
+        """Wait for every submitted job to finish."""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return list(self.jobs.values())
+
+    async def _run(self, job: DownloadJob) -> None:
+        async with self._semaphore:
+            job.status = "running"
+            try:
+                await self._fetch(job, await self._previous(job))
+                await asyncio.to_thread(
+                    self.index.add, job.save_as, job.url, job.sha256, job.bytes_done, job.etag, job.last_modified
+                )
+                job.status = "done"
+                logger.info(f"Download finished: {job.describe()}")
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Download failed: {job.describe()}")
+
+    async def _previous(self, job: DownloadJob) -> Optional[IndexedFile]:
+        """Return an earlier download of the URL that may be reused, once same-URL downloads in progress finish."""
+        running = [
+            other.task for other in self.jobs.values()
+            if other is not job and other.url == job.url and other.status == "running"
+        ]
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+        return await asyncio.to_thread(self.index.find, job.url)
+
+    async def _reuse(self, job: DownloadJob, previous: IndexedFile) -> None:
+        """Copy an earlier download whose content the server confirmed, or that is still fresh."""
+        if os.path.abspath(previous.path) != os.path.abspath(job.save_as):
+            await asyncio.to_thread(shutil.copyfile, previous.path, job.save_as)
+        for path in _partial_paths(job.save_as):
+            if os.path.exists(path):
+                await asyncio.to_thread(os.remove, path)
+        job.sha256 = previous.sha256
+        job.etag, job.last_modified = previous.etag, previous.last_modified
+        job.bytes_done = job.total_bytes = previous.size
+        logger.info(f"Reused {previous.path} for {job.url}")
+
+    async def _fetch(self, job: DownloadJob, previous: Optional[IndexedFile] = None) -> None:
+        """Stream the URL into a .part file, resuming it if present, then rename atomically.
+
+        An earlier download of the URL is revalidated with its ETag or Last-Modified
+        and reused if the server answers 304 Not Modified. Without validators it is
+        reused until DOWNLOAD_INDEX_TTL passes. A partial file is only resumed with
+        If-Range, so the server sends the whole file again if it changed.
+        """
+        part_path, validator_path = _partial_paths(job.save_as)
+        headers = {}
+        if previous is not None:
+            if previous.etag or previous.last_modified:
+                if previous.etag:
+                    headers["If-None-Match"] = previous.etag
+                if previous.last_modified:
+                    headers["If-Modified-Since"] = previous.last_modified
+            elif time.time() - previous.updated_at < DOWNLOAD_INDEX_TTL:
+                await self._reuse(job, previous)
+                return
+
+        offset = 0
+        if not headers and os.path.exists(part_path):
+            if_range = await asyncio.to_thread(_read_if_range, validator_path)
+            if if_range:
+                offset = os.path.getsize(part_path)
+                headers = {"Range": f"bytes={offset}-", "If-Range": if_range}
+        digest = hashlib.sha256()
+
+        async with self.http_client.stream(job.url, headers=headers) as response:
+            if response.status == 304 and previous is not None:
+                await self._reuse(job, previous)
+                return
+            if response.status == 206 and offset:
+                await asyncio.to_thread(_hash_file_into, part_path, digest)
+                mode = "ab"
+                logger.info(f"Resuming {job.url} at byte {offset}")
+            elif response.status == 200:
+                offset = 0
+                mode = "wb"
+            else:
+                raise RuntimeError(f"Failed with status code {response.status}")
+
+            if mode == "wb":
+                job.etag = response.headers.get("ETag")
+                job.last_modified = response.headers.get("Last-Modified")
+                await asyncio.to_thread(_write_validators, validator_path, job.etag, job.last_modified)
+            else:
+                job.etag, job.last_modified = await asyncio.to_thread(_read_validators, validator_path)
+            job.bytes_done = offset
+            if response.content_length is not None:
+                job.total_bytes = offset + response.content_length
+
+            f = await asyncio.to_thread(open, part_path, mode)
+            try:
+                # The network hands over whatever is buffered, often a few KB; collect it
+                # into one write of chunk_size so each thread hop moves a large block
+                chunk_size = MIN_CHUNK_SIZE
+                buffer = bytearray()
+                async for data in response.content.iter_any():
+                    buffer += data
+                    job.bytes_done += len(data)
+                    if len(buffer) >= chunk_size:
+                        await self._write(f, buffer, digest)
+                        buffer = bytearray()
+                        chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+                if buffer:
+                    await self._write(f, buffer, digest)
+            finally:
+                await asyncio.to_thread(f.close)
+
+        await asyncio.to_thread(os.replace, part_path, job.save_as)
+        if os.path.exists(validator_path):
+            await asyncio.to_thread(os.remove, validator_path)
+        job.sha256 = digest.hexdigest()
+
+    @staticmethod
+    async def _write(f, buffer: bytearray, digest) -> None:
+        digest.update(buffer)
+        await asyncio.to_thread(f.write, buffer)
+
+
+def _partial_paths(save_as: str) -> tuple:
+    """Return the paths of a download's partial file and of the validators it was started with."""
+    return f"{save_as}.part", f"{save_as}.part.json"
+
+
+def _write_validators(path: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"etag": etag, "last_modified": last_modified}, f)
+
+
+def _read_validators(path: str) -> tuple:
+    try:
+        with open(path, encoding="utf-8") as f:
+            validators = json.load(f)
+    except (OSError, ValueError):
+        return None, None
+    return validators.get("etag"), validators.get("last_modified")
+
+
+def _read_if_range(path: str) -> Optional[str]:
+    """Return the If-Range value for resuming a partial file: a strong ETag, else Last-Modified."""
+    etag, last_modified = _read_validators(path)
+    if etag and not etag.startswith("W/"):
+        return etag
+    return last_modified
+
+
+def _hash_file_into(path: str, digest) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(MAX_CHUNK_SIZE), b""):
+            digest.update(block)
+
+
+def _sha256_file(path: str) -> Optional[str]:
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    _hash_file_into(path, digest)
+    return digest.hexdigest()
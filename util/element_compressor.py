@@ -0,0 +1,158 @@
+from collections import Counter
+from typing import Dict, List, Set
+
+from util.dom_snapshot import PageElement
+from util.utils import TokenUtils
+
+# Tags that never help the agent locate or read anything
+DROPPED_TAGS = frozenset([
+    "html", "head", "body", "meta", "link", "script", "style", "noscript", "template",
+    "svg", "path", "g", "defs", "use", "br", "hr", "wbr", "base",
+])
+
+# Tags the agent can interact with
+INTERACTIVE_TAGS = frozenset([
+    "a", "button", "input", "select", "option", "textarea", "label", "form", "summary", "details",
+])
+INTERACTIVE_ATTRS = frozenset(["href", "onclick", "role", "tabindex", "contenteditable"])
+
+# Attributes describing what an element is, used for relevance scoring
+DESCRIPTIVE_ATTRS = ("id", "name", "title", "placeholder", "aria-label", "value", "alt")
+
+# Repeated attribute values at least this long are replaced by a short reference
+MIN_ALIAS_LENGTH = 40
+MIN_ALIAS_REPEATS = 3
+LEGEND_TITLE = "Repeated attribute values:\n"
+
+# Ranked elements that may not fit in a row before the rest are skipped without being tokenized
+MAX_CONSECUTIVE_MISSES = 8
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f" {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ElementCompressor:
+    """Fit a page's element list into a token budget, keeping the most useful elements."""
+
+    def __init__(self, max_tokens: int = 10000):
+        self.max_tokens = max_tokens
+
+    @staticmethod
+    def is_interactive(elem: PageElement) -> bool:
+        """Return True for elements the agent can click, type into or select."""
+        return elem.tag in INTERACTIVE_TAGS or any(attr in elem.attrs for attr in INTERACTIVE_ATTRS)
+
+    def keep(self, elem: PageElement) -> bool:
+        """Drop page furniture and empty wrappers that carry no text or interaction."""
+        if elem.tag in DROPPED_TAGS:
+            return False
+        return bool(elem.text) or self.is_interactive(elem)
+
+    def relevance(self, elem: PageElement, instruction_grams: Set[str]) -> float:
+        """Score an element by how much of its text and description appears in the instruction."""
+        described = " ".join(
+            [elem.text[:100]] + [str(elem.attrs[attr]) for attr in DESCRIPTIVE_ATTRS if attr in elem.attrs]
+        )
+        grams = _trigrams(described)
+        score = len(grams & instruction_grams) / len(grams) if instruction_grams and grams else 0.0
+        if self.is_interactive(elem):
+            score += 0.5
+        return score
+
+    def compress(self, elements: List[PageElement], instruction: str = "") -> str:
+        """Return the most relevant elements, in document order, within the token budget."""
+        kept = []
+        seen = set()
+        for elem in elements:
+            if self.keep(elem) and elem.element_string not in seen:
+                seen.add(elem.element_string)
+                kept.append(elem)
+        if not kept:
+            return "No elements found."
+
+        aliases = self._aliases(kept)
+        lines = [self._render(elem, aliases) for elem in kept]
+        full = self._legend(aliases, aliases) + "\n".join(lines)
+        if TokenUtils.fits_without_encoding(full, self.max_tokens):
+            return full
+
+        # Rank by relevance and take elements until the budget is spent
+        instruction_grams = _trigrams(instruction) if instruction else set()
+        ranked = sorted(
+            range(len(kept)),
+            key=lambda i: self.relevance(kept[i], instruction_grams),
+            reverse=True,
+        )
+        encoding = TokenUtils.encoding()
+        # Leave room for the header line and the legend's title
+        remaining = self.max_tokens - 20 - (len(encoding.encode(LEGEND_TITLE)) if aliases else 0)
+        # Cost of the shortest line, a floor on what any further element can need
+        min_cost = len(encoding.encode(min(lines, key=len))) + 1
+        # Legend lines are only paid for, and shown, once a chosen line uses their value
+        used: Dict[str, str] = {}
+        chosen = []
+        misses = 0
+        for i in ranked:
+            if remaining < min_cost or misses >= MAX_CONSECUTIVE_MISSES:
+                break
+            new = [value for value in self._aliased_values(kept[i], aliases) if value not in used]
+            cost = len(encoding.encode(lines[i])) + 1
+            min_cost = min(min_cost, cost)
+            cost += sum(len(encoding.encode(self._legend_line(value, aliases[value]))) for value in new)
+            if cost > remaining:
+                misses += 1
+                continue
+            chosen.append(i)
+            for value in new:
+                used[value] = aliases[value]
+            remaining -= cost
+            misses = 0
+
+        chosen.sort()
+        header = f"(showing the {len(chosen)} of {len(kept)} elements most relevant to the instruction)\n"
+        return header + self._legend(used, aliases) + "\n".join(lines[i] for i in chosen)
+
+    @staticmethod
+    def _legend_line(value: str, alias: str) -> str:
+        return f'{alias}="{value}"\n'
+
+    def _legend(self, used: Dict[str, str], aliases: Dict[str, str]) -> str:
+        """Return the legend of the used aliases, in alias order, or "" if none is used."""
+        if not used:
+            return ""
+        return LEGEND_TITLE + "".join(self._legend_line(v, a) for v, a in aliases.items() if v in used) + "\n"
+
+    @staticmethod
+    def _aliased_values(elem: PageElement, aliases: Dict[str, str]) -> List[str]:
+        return list(dict.fromkeys(str(value) for value in elem.attrs.values() if str(value) in aliases))
+
+    @staticmethod
+    def _aliases(elements: List[PageElement]) -> Dict[str, str]:
+        """Map long attribute values that repeat across elements to short @N references."""
+        counts = Counter(
+            str(value)
+            for elem in elements
+            for value in elem.attrs.values()
+            if len(str(value)) >= MIN_ALIAS_LENGTH
+        )
+        repeated = [value for value, count in counts.most_common() if count >= MIN_ALIAS_REPEATS]
+        aliases = {value: f"@{n}" for n, value in enumerate(repeated, start=1)}
+        # Keep an alias only where the characters it saves outweigh its legend line
+        return {
+            value: alias
+            for value, alias in aliases.items()
+            if (len(value) + 2 - len(alias)) * counts[value] > len(ElementCompressor._legend_line(value, alias))
+        }
+
+    @staticmethod
+    def _render(elem: PageElement, aliases: Dict[str, str]) -> str:
+        if not aliases:
+            return elem.element_string
+        attrs_string = " ".join(
+            [f"{k}={aliases[str(v)]}" if str(v) in aliases else f'{k}="{v}"' for k, v in elem.attrs.items()]
+        )
+        if elem.text and len(elem.text) < 100:
+            return f"<{elem.tag} {attrs_string}>{elem.text}</{elem.tag}>"
+        return f"<{elem.tag} {attrs_string}>"
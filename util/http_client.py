@@ -0,0 +1,160 @@
+import os
+import random
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiohttp
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Client settings
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "8"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+# Streamed bodies, such as downloads, have no total limit; only connecting and each read are bounded
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "15"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+
+# Responses worth retrying, and the longest wait honoured between attempts
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+MAX_RETRY_DELAY = 60.0
+
+logger = get_logger(__name__)
+
+
+class HttpClient:
+    """A shared keep-alive aiohttp client with retries and conditional GETs."""
+
+    def __init__(
+        self,
+        limit_per_host: int = HTTP_LIMIT_PER_HOST,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        read_timeout: float = HTTP_READ_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff: float = 0.5,
+        conditional: bool = True,
+        max_cached_pages: int = 64,
+    ):
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.conditional = conditional
+        self.max_cached_pages = max_cached_pages
+        self._session: Optional[aiohttp.ClientSession] = None
+        # url -> (etag, last_modified, text) for conditional requests
+        self._validated: "OrderedDict[str, Tuple[Optional[str], Optional[str], str]]" = OrderedDict()
+
+    async def __aenter__(self) -> "HttpClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def session(self) -> aiohttp.ClientSession:
+        """Return the shared session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """Close the session and its pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_text(self, url: str) -> Tuple[int, str]:
+        """GET a URL and return (status, text), revalidating cached pages with ETag/Last-Modified."""
+        headers = {}
+        cached = self._validated.get(url) if self.conditional else None
+        if cached is not None:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        async with self.stream(url, headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            if response.status == 304 and cached is not None:
+                self._validated.move_to_end(url)
+                return 200, cached[2]
+            text = await response.text()
+            if response.status == 200 and self.conditional:
+                self._remember(url, response, text)
+            return response.status, text
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """GET a URL with retries and yield the unread response.
+
+        Without a timeout, the stream timeout applies, so large bodies are not cut
+        off by the session's total limit.
+        """
+        response = await self._request(url, headers or {}, timeout or self.stream_timeout)
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def _request(self, url: str, headers: Dict[str, str], timeout: aiohttp.ClientTimeout) -> aiohttp.ClientResponse:
+        attempt = 0
+        while True:
+            try:
+                response = await self.session().get(url, headers=headers, timeout=timeout)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                logger.warning(f"GET [{url}] failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = self._retry_after(response) or self._backoff_delay(attempt)
+                response.release()
+                logger.warning(f"GET [{url}] returned {response.status}, retrying in {delay:.1f}s")
+            attempt += 1
+            await asyncio.sleep(min(delay, MAX_RETRY_DELAY))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def _remember(self, url: str, response: aiohttp.ClientResponse, text: str) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not etag and not last_modified:
+            self._validated.pop(url, None)
+            return
+        self._validated[url] = (etag, last_modified, text)
+        self._validated.move_to_end(url)
+        while len(self._validated) > self.max_cached_pages:
+            self._validated.popitem(last=False)
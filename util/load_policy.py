@@ -0,0 +1,287 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import weakref
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+from urllib.parse import urlparse
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+
+def _csv(value: str) -> FrozenSet[str]:
+    return frozenset(item.strip().lower() for item in value.split(",") if item.strip())
+
+
+# Page load settings
+LOAD_POLICY = os.getenv("LOAD_POLICY", "true").lower() not in ("0", "false", "no")
+# Playwright resource types never fetched, e.g. image, media, font, stylesheet
+BLOCK_RESOURCE_TYPES = _csv(os.getenv("BLOCK_RESOURCE_TYPES", "image,media,font"))
+# Domains, and their subdomains, never fetched
+BLOCK_DOMAINS = _csv(os.getenv(
+    "BLOCK_DOMAINS",
+    "google-analytics.com,googletagmanager.com,doubleclick.net,googlesyndication.com,"
+    "facebook.net,hotjar.com,segment.io,newrelic.com,nr-data.net",
+))
+# "domcontentloaded" returns once the HTML is parsed; "load" also waits for subresources
+PAGE_WAIT_UNTIL = os.getenv("PAGE_WAIT_UNTIL", "domcontentloaded")
+NAVIGATION_TIMEOUT = float(os.getenv("NAVIGATION_TIMEOUT", "15"))
+STATIC_CACHE = os.getenv("STATIC_CACHE", "false").lower() not in ("0", "false", "no")
+STATIC_CACHE_DIR = os.getenv("STATIC_CACHE_DIR", ".static_cache")
+STATIC_CACHE_MAX_MB = int(os.getenv("STATIC_CACHE_MAX_MB", "128"))
+STATIC_CACHE_TTL = float(os.getenv("STATIC_CACHE_TTL", str(24 * 3600)))
+
+WAIT_UNTIL_STATES = ("commit", "domcontentloaded", "load", "networkidle")
+# Resource types kept in the static cache
+CACHEABLE_TYPES = frozenset(["script", "stylesheet", "font", "image"])
+# Headers describing the body as it came over the wire; route.fetch() hands over the decoded body
+WIRE_HEADERS = frozenset(["content-encoding", "content-length", "transfer-encoding"])
+
+logger = get_logger(__name__)
+
+# Traffic counters of each browser context the policy was applied to
+_context_traffic: "weakref.WeakKeyDictionary[Any, ContextTraffic]" = weakref.WeakKeyDictionary()
+
+
+def body_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """Return the headers without those that only held for the encoded body on the wire."""
+    return {name: value for name, value in headers.items() if name.lower() not in WIRE_HEADERS}
+
+
+def context_traffic(context: Any) -> Optional["ContextTraffic"]:
+    """Return the traffic counters of a browser context, if a load policy is applied to it."""
+    return _context_traffic.get(context)
+
+
+class StaticAssetCache:
+    """On-disk cache of static assets, since route interception turns off the browser's own cache."""
+
+    def __init__(
+        self,
+        directory: str = STATIC_CACHE_DIR,
+        max_bytes: int = STATIC_CACHE_MAX_MB * 1024 * 1024,
+        ttl_seconds: float = STATIC_CACHE_TTL,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # key -> (size, stored_at, used_at)
+        self._entries: Dict[str, Tuple[int, float, float]] = {}
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                # Left behind by a put() that was interrupted
+                os.remove(os.path.join(directory, name))
+            elif name.endswith(".json"):
+                key = name[:-5]
+                path = os.path.join(directory, key)
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    self._entries[key] = (stat.st_size, stat.st_mtime, stat.st_mtime)
+        self._bytes = sum(size for size, _, _ in self._entries.values())
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def get(self, url: str) -> Optional[Tuple[int, Dict[str, str], bytes]]:
+        """Return the status, headers and body stored for the URL, if fresh."""
+        key = self.key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl_seconds:
+                self._remove(key)
+                return None
+            self._entries[key] = (entry[0], entry[1], time.time())
+        try:
+            with open(os.path.join(self.directory, key + ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(os.path.join(self.directory, key), "rb") as f:
+                body = f.read()
+        except OSError:
+            with self._lock:
+                self._remove(key)
+            return None
+        return meta["status"], meta["headers"], body
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes) -> None:
+        """Store an asset; each file is written to a temporary name and renamed, so readers never see a partial one."""
+        if len(body) > self.max_bytes:
+            return
+        key = self.key(url)
+        meta = json.dumps({"url": url, "status": status, "headers": body_headers(headers)}).encode("utf-8")
+        for path, data in ((os.path.join(self.directory, key), body), (os.path.join(self.directory, key + ".json"), meta)):
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries[key][0]
+            now = time.time()
+            self._entries[key] = (len(body), now, now)
+            self._bytes += len(body)
+            # Evict the least recently used assets
+            for old in sorted(self._entries, key=lambda k: self._entries[k][2]):
+                if self._bytes <= self.max_bytes:
+                    break
+                self._remove(old)
+
+    def _remove(self, key: str) -> None:
+        size = self._entries.pop(key)[0]
+        self._bytes -= size
+        for path in (os.path.join(self.directory, key), os.path.join(self.directory, key + ".json")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def cacheable(status: int, headers: Dict[str, str]) -> bool:
+        cache_control = headers.get("cache-control", "").lower()
+        return status == 200 and "no-store" not in cache_control and "private" not in cache_control
+
+
+class ContextTraffic:
+    """Request counters of one browser context."""
+
+    def __init__(self, policy: "LoadPolicy"):
+        self.policy = policy
+        self.requests = 0
+        self.blocked = 0
+        self.cache_hits = 0
+        self.bytes_saved = 0
+
+    def counters(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "cache_hits": self.cache_hits,
+            "bytes_saved": self.bytes_saved,
+        }
+
+    def record_navigation(self, url: str, duration_ms: float, before: Dict[str, int]) -> Dict[str, Any]:
+        """Return the timing and counters of one navigation, and add them to the per-site totals."""
+        delta = {name: value - before[name] for name, value in self.counters().items()}
+        self.policy.record_site(url, duration_ms, delta)
+        return {"duration_ms": round(duration_ms, 3), "wait_until": self.policy.wait_until, **delta}
+
+
+class LoadPolicy:
+    """Block unneeded requests and serve static assets from a local cache in browser contexts.
+
+    Applied with Playwright route interception to every context the pool leases.
+    Navigation timing and bytes saved are aggregated per site so the policy can be
+    tuned for each one.
+    """
+
+    def __init__(
+        self,
+        block_types: FrozenSet[str] = BLOCK_RESOURCE_TYPES,
+        block_domains: FrozenSet[str] = BLOCK_DOMAINS,
+        wait_until: str = PAGE_WAIT_UNTIL,
+        navigation_timeout: float = NAVIGATION_TIMEOUT,
+        static_cache: Optional[StaticAssetCache] = None,
+    ):
+        if wait_until not in WAIT_UNTIL_STATES:
+            raise ValueError(f"Unknown wait_until {wait_until!r}; expected one of {', '.join(WAIT_UNTIL_STATES)}.")
+        self.block_types = block_types
+        self.block_domains = block_domains
+        self.wait_until = wait_until
+        self.navigation_timeout = navigation_timeout
+        self.static_cache = static_cache
+        self.sites: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_env(cls) -> Optional["LoadPolicy"]:
+        """Return the policy configured in the environment, or None if it is disabled."""
+        if not LOAD_POLICY:
+            return None
+        return cls(static_cache=StaticAssetCache() if STATIC_CACHE else None)
+
+    async def apply(self, context: Any) -> None:
+        context.set_default_navigation_timeout(self.navigation_timeout * 1000)
+        traffic = ContextTraffic(self)
+        _context_traffic[context] = traffic
+
+        async def handle(route):
+            try:
+                await self._handle(route, traffic)
+            except Exception as e:
+                # A closed page aborts its pending routes; anything else falls back to the network
+                logger.debug(f"Route handling failed for {route.request.url}: {e}")
+                try:
+                    await route.continue_()
+                except Exception:
+                    pass
+
+        await context.route("**/*", handle)
+
+    def blocked(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.block_types:
+            return True
+        host = urlparse(url).hostname or ""
+        return any(host == domain or host.endswith("." + domain) for domain in self.block_domains)
+
+    async def _handle(self, route, traffic: ContextTraffic) -> None:
+        request = route.request
+        traffic.requests += 1
+        if self.blocked(request.url, request.resource_type):
+            traffic.blocked += 1
+            await route.abort("blockedbyclient")
+            return
+
+        if self.static_cache is None or request.method != "GET" or request.resource_type not in CACHEABLE_TYPES:
+            await route.continue_()
+            return
+
+        cached = await asyncio.to_thread(self.static_cache.get, request.url)
+        if cached is not None:
+            status, headers, body = cached
+            traffic.cache_hits += 1
+            traffic.bytes_saved += len(body)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        response = await route.fetch()
+        body = await response.body()
+        headers = body_headers(response.headers)
+        if StaticAssetCache.cacheable(response.status, headers):
+            await asyncio.to_thread(self.static_cache.put, request.url, response.status, headers, body)
+        await route.fulfill(response=response, headers=headers, body=body)
+
+    def record_site(self, url: str, duration_ms: float, delta: Dict[str, int]) -> None:
+        site = urlparse(url).hostname or url
+        totals = self.sites.setdefault(site, {"navigations": 0, "total_ms": 0.0, "max_ms": 0.0})
+        totals["navigations"] += 1
+        totals["total_ms"] += duration_ms
+        totals["max_ms"] = max(totals["max_ms"], duration_ms)
+        for name, value in delta.items():
+            totals[name] = totals.get(name, 0) + value
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "wait_until": self.wait_until,
+            "navigation_timeout_s": self.navigation_timeout,
+            "blocked_types": sorted(self.block_types),
+            "static_cache": self.static_cache is not None,
+            "sites": {
+                site: {
+                    **{name: value for name, value in totals.items() if name != "total_ms"},
+                    "mean_ms": round(totals["total_ms"] / totals["navigations"], 3),
+                    "max_ms": round(totals["max_ms"], 3),
+                }
+                for site, totals in self.sites.items()
+            },
+        }
@@ -1,46 +1,197 @@
-import logging
-from logging.handlers import RotatingFileHandler
 import os
 import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Iterator, Optional
 
-def get_logger(name):
-    # Ensure 'logs/' exists
-    os.makedirs("logs", exist_ok=True)
-
-    # Common log format
-    fmt = "%(asctime)s - %(name)s - Line: %(lineno)d - %(levelname)s - %(message)s"
-    formatter = logging.Formatter(fmt)
-
-    # File handler (rotates at 10 MB, keeps 5 backups) with UTF-8 encoding
-    file_handler = RotatingFileHandler(
-        "logs/app.log",
-        maxBytes=10 * 1024 * 1024,
-        backupCount=5,
-        encoding="utf-8"  # ✅ Enables Unicode
-    )
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(formatter)
-
-    # Ensure stdout can handle UTF-8
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Logging settings
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-subsystem levels by logger name prefix, e.g. "tools=WARNING,llm=DEBUG,util.http_client=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# "json" writes one JSON object per line; "text" keeps the readable format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+# Messages longer than this are truncated before they are queued
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))
+# Share of truncated INFO and DEBUG messages that are kept; warnings and errors are always kept
+LOG_LARGE_SAMPLE_RATE = float(os.getenv("LOG_LARGE_SAMPLE_RATE", "1.0"))
+# Let LangChain print chains and prompts to stdout (AgentExecutor and model verbose mode)
+LANGCHAIN_VERBOSE = os.getenv("LANGCHAIN_VERBOSE", "false").lower() not in ("0", "false", "no")
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - Line: %(lineno)d - %(levelname)s - [%(run_id)s] %(message)s"
+
+# Run id of the agent run or job the current task works for
+_run_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("log_run_id", default=None)
+
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+@contextmanager
+def log_context(run_id: Optional[str]) -> Iterator[None]:
+    """Tag records logged inside the block, including tasks it starts, with the run id."""
+    token = _run_id.set(run_id)
     try:
-        sys.stdout.reconfigure(encoding="utf-8")  # ✅ Enables Unicode in console
-    except AttributeError:
-        # Fallback for older Python versions
-        pass
+        yield
+    finally:
+        _run_id.reset(token)
+
+
+def _level(name: str) -> int:
+    level = logging.getLevelName(name.strip().upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+def _parse_levels(spec: str) -> Dict[str, int]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            prefix, level = item.split("=", 1)
+            levels[prefix.strip()] = _level(level)
+    return levels
+
+
+SUBSYSTEM_LEVELS = _parse_levels(LOG_LEVELS)
+
+
+def level_for(name: str) -> int:
+    """Return the level configured for the longest matching logger name prefix."""
+    matches = [prefix for prefix in SUBSYSTEM_LEVELS if name == prefix or name.startswith(prefix + ".")]
+    if matches:
+        return SUBSYSTEM_LEVELS[max(matches, key=len)]
+    return _level(LOG_LEVEL)
+
 
-    # Stream handler
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setLevel(logging.INFO)
-    stream_handler.setFormatter(formatter)
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object per line."""
 
-    # Logger setup
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "line": record.lineno,
+            "run_id": getattr(record, "run_id", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TruncatingQueueHandler(QueueHandler):
+    """Queue records for the background listener, with the run id attached and large messages cut.
+
+    The message is rendered and truncated on the calling task, so the run id is
+    taken from its context and no large payload is kept in the queue.
+    """
+
+    def __init__(
+        self,
+        log_queue: queue.Queue,
+        max_chars: int = LOG_MAX_MESSAGE_CHARS,
+        sample_rate: float = LOG_LARGE_SAMPLE_RATE,
+    ):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+        self.sample_rate = sample_rate
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> Optional[logging.LogRecord]:
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            if record.levelno < logging.WARNING and random.random() >= self.sample_rate:
+                self.dropped += 1
+                return None
+            message = f"{message[:self.max_chars]}... ({len(message) - self.max_chars} chars truncated)"
+        exc_text = None
+        if record.exc_info:
+            exc_text = logging.Formatter().formatException(record.exc_info)[-self.max_chars:]
+
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        record.stack_info = None
+        record.run_id = _run_id.get() or "-"
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            prepared = self.prepare(record)
+            if prepared is not None:
+                self.enqueue(prepared)
+        except Exception:
+            self.handleError(record)
+
+
+def _shared_handler() -> QueueHandler:
+    """Start the listener thread that writes to the file and stdout, once per process."""
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _queue_handler is not None:
+            return _queue_handler
+
+        directory = os.path.dirname(LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+
+        # File handler (rotates at 10 MB, keeps 5 backups) with UTF-8 encoding
+        file_handler = RotatingFileHandler(LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8")
+        file_handler.setFormatter(formatter)
+
+        # Ensure stdout can handle UTF-8
+        try:
+            sys.stdout.reconfigure(encoding="utf-8")
+        except AttributeError:
+            # Fallback for older Python versions
+            pass
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+
+        log_queue: queue.Queue = queue.Queue(-1)
+        _queue_handler = TruncatingQueueHandler(log_queue)
+        # Disk and console writes happen on the listener's thread, never on the event loop
+        _listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _queue_handler
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name):
+    # Logger setup; the level can be set per subsystem with LOG_LEVELS
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(level_for(name))
     logger.propagate = False
 
     # Avoid adding duplicate handlers
     if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+        logger.addHandler(_shared_handler())
 
-    return logger
\ No newline at end of file
+    return logger
@@ -0,0 +1,290 @@
+import os
+import heapq
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from util.dom_snapshot import PageElement, PageSnapshot
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Matcher engine used by fuzzy_fetch_html_tool: "trigram" or "sequence"
+FUZZY_MATCHER = os.getenv("FUZZY_MATCHER", "trigram")
+
+# Only the start of long texts is indexed; they cannot pass the threshold anyway
+MAX_INDEXED_CHARS = 512
+
+# Attributes that describe elements without text, such as inputs, for batch search
+DESCRIPTIVE_ATTRS = ("aria-label", "placeholder", "title", "alt", "value", "name", "id")
+
+
+class BatchQuery(NamedTuple):
+    """One phrase of a batch search, optionally restricted to some tag types."""
+    text: str
+    tags: Optional[FrozenSet[str]] = None
+
+
+def describe_element(elem: PageElement) -> str:
+    """Text used to match an element in batch search: its text, else its descriptive attributes."""
+    if elem.text:
+        return elem.text
+    return " ".join(str(elem.attrs[attr]) for attr in DESCRIPTIVE_ATTRS if attr in elem.attrs)
+
+
+class ElementMatcher(ABC):
+    """Base class for engines that rank page elements against a search text."""
+
+    name = ""
+
+    @abstractmethod
+    def match(
+        self,
+        snapshot: PageSnapshot,
+        search_text: str,
+        threshold: float = 0.8,
+        top_k: int = 50,
+    ) -> List[PageElement]:
+        """Return every element scoring >= threshold in document order, otherwise the top_k elements."""
+
+    @abstractmethod
+    def match_batch(
+        self,
+        snapshot: PageSnapshot,
+        queries: Sequence[BatchQuery],
+        top_k: int = 5,
+    ) -> List[List[Tuple[PageElement, float]]]:
+        """Return the top_k (element, score) pairs for each query, best first.
+
+        Elements without text are matched on their descriptive attributes, so
+        inputs can be found by placeholder or name. Queries with tags only
+        consider elements of those tag types.
+        """
+
+    @staticmethod
+    def described_elements(snapshot: PageSnapshot) -> Tuple[List[PageElement], List[str]]:
+        """Return the elements batch search considers, with their lower-cased descriptions."""
+        key = "described"
+        if key not in snapshot.match_indexes:
+            elements, texts = [], []
+            for elem in snapshot.elements:
+                described = describe_element(elem)
+                if described:
+                    elements.append(elem)
+                    texts.append(described.lower()[:MAX_INDEXED_CHARS])
+            snapshot.match_indexes[key] = (elements, texts)
+        return snapshot.match_indexes[key]
+
+
+def _ratio(text: str, search_lower: str) -> float:
+    return SequenceMatcher(None, text.lower(), search_lower).ratio()
+
+
+class SequenceElementMatcher(ElementMatcher):
+    """Score every element with difflib.SequenceMatcher (the original behaviour)."""
+
+    name = "sequence"
+
+    def match(self, snapshot, search_text, threshold=0.8, top_k=50):
+        elements = snapshot.text_elements()
+        search_lower = search_text.lower()
+        ratios = [_ratio(elem.text, search_lower) for elem in elements]
+
+        matched = [elem for elem, ratio in zip(elements, ratios) if ratio >= threshold]
+        if matched:
+            return matched
+        best = heapq.nlargest(top_k, range(len(elements)), key=ratios.__getitem__)
+        return [elements[i] for i in best]
+
+    def match_batch(self, snapshot, queries, top_k=5):
+        elements, texts = self.described_elements(snapshot)
+        scored: List[List[Tuple[float, int]]] = []
+        for query in queries:
+            # difflib caches its index of seq2, so the query stays fixed while the elements vary
+            matcher = SequenceMatcher(None, b=query.text.lower())
+            pairs = []
+            for i, (elem, text) in enumerate(zip(elements, texts)):
+                if query.tags and elem.tag not in query.tags:
+                    continue
+                matcher.set_seq1(text)
+                pairs.append((matcher.ratio(), i))
+            scored.append(pairs)
+        return [
+            [(elements[i], ratio) for ratio, i in heapq.nlargest(top_k, pairs, key=lambda pair: pair[0])]
+            for pairs in scored
+        ]
+
+
+def _ngrams(text: str, n: int) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class NgramIndex:
+    """Character n-gram inverted index over the text elements of one snapshot."""
+
+    def __init__(self, elements: List[PageElement], n: int = 3, texts: Optional[List[str]] = None):
+        """Index the elements' text, or the given lower-cased texts instead."""
+        self.n = n
+        self.elements = elements
+        lengths = (len(text) for text in texts) if texts is not None else (len(elem.text) for elem in elements)
+        self.lengths = np.fromiter(lengths, dtype=np.int64, count=len(elements))
+        self.sizes = np.zeros(len(elements), dtype=np.int64)
+
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for i, elem in enumerate(elements):
+            text = texts[i] if texts is not None else elem.text.lower()[:MAX_INDEXED_CHARS]
+            grams = _ngrams(text, n)
+            self.sizes[i] = len(grams)
+            for gram in grams:
+                postings[gram].append(i)
+        self.postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def scores(self, search_lower: str) -> np.ndarray:
+        """Return the Dice coefficient of n-gram sets between the query and every element."""
+        grams = _ngrams(search_lower, self.n)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return np.zeros(len(self.elements))
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.elements))
+        return 2.0 * overlap / (self.sizes + len(grams))
+
+
+class NgramElementMatcher(ElementMatcher):
+    """Rank elements through an n-gram index built once per snapshot.
+
+    With rerank=True the threshold pass is exact: only elements whose length
+    makes ratio >= threshold possible are scored with SequenceMatcher. The
+    top_k fallback re-ranks the best rerank_depth n-gram candidates with
+    SequenceMatcher, so results track the original tool closely.
+    """
+
+    name = "trigram"
+
+    def __init__(self, n: int = 3, rerank: bool = True, rerank_depth: int = 200):
+        self.n = n
+        self.rerank = rerank
+        self.rerank_depth = rerank_depth
+
+    def index(self, snapshot: PageSnapshot) -> NgramIndex:
+        """Return the snapshot's index, building it on first use."""
+        key = f"{self.name}:{self.n}"
+        if key not in snapshot.match_indexes:
+            snapshot.match_indexes[key] = NgramIndex(snapshot.text_elements(), self.n)
+        return snapshot.match_indexes[key]
+
+    def match(self, snapshot, search_text, threshold=0.8, top_k=50):
+        index = self.index(snapshot)
+        elements = index.elements
+        search_lower = search_text.lower()
+        scores = index.scores(search_lower)
+
+        if self.rerank:
+            matched = self._exact_matches(index, search_lower, threshold)
+        else:
+            matched = np.flatnonzero(scores >= threshold).tolist()
+        if matched:
+            return [elements[i] for i in matched]
+
+        candidates = np.flatnonzero(scores).tolist()
+        if len(candidates) < top_k:
+            # Too few elements share an n-gram, e.g. for a typo; rank them all like the sequence engine
+            ratios = [_ratio(elem.text, search_lower) for elem in elements]
+            best = heapq.nlargest(top_k, range(len(elements)), key=ratios.__getitem__)
+            return [elements[i] for i in best]
+        if not self.rerank:
+            best = heapq.nlargest(top_k, candidates, key=scores.__getitem__)
+            return [elements[i] for i in best]
+
+        shortlist = sorted(heapq.nlargest(self.rerank_depth, candidates, key=scores.__getitem__))
+        ratios = {i: _ratio(elements[i].text, search_lower) for i in shortlist}
+        best = heapq.nlargest(top_k, shortlist, key=ratios.__getitem__)
+        return [elements[i] for i in best]
+
+    def match_batch(self, snapshot, queries, top_k=5):
+        key = f"{self.name}:{self.n}:described"
+        elements, texts = self.described_elements(snapshot)
+        if key not in snapshot.match_indexes:
+            snapshot.match_indexes[key] = NgramIndex(elements, self.n, texts=texts)
+        index = snapshot.match_indexes[key]
+        tags = np.array([elem.tag for elem in elements], dtype=object)
+
+        results = []
+        for query in queries:
+            query_lower = query.text.lower()
+            scores = index.scores(query_lower)
+            if query.tags:
+                allowed = np.isin(tags, list(query.tags))
+                scores = np.where(allowed, scores, 0.0)
+            candidates = np.flatnonzero(scores).tolist()
+            if not candidates:
+                # No shared trigram, e.g. a typo in a short query; compare against every allowed element
+                candidates = np.flatnonzero(allowed).tolist() if query.tags else list(range(len(elements)))
+                scores = np.zeros(len(elements))
+                for i in candidates:
+                    scores[i] = SequenceMatcher(None, texts[i], query_lower).ratio()
+            if not self.rerank:
+                best = heapq.nlargest(top_k, candidates, key=scores.__getitem__)
+                results.append([(elements[i], float(scores[i])) for i in best])
+                continue
+            shortlist = heapq.nlargest(max(top_k * 4, 20), candidates, key=scores.__getitem__)
+            ratios = {i: SequenceMatcher(None, texts[i], query_lower).ratio() for i in shortlist}
+            best = heapq.nlargest(top_k, shortlist, key=ratios.__getitem__)
+            results.append([(elements[i], ratios[i]) for i in best])
+        return results
+
+    @staticmethod
+    def _exact_matches(index: NgramIndex, search_lower: str, threshold: float) -> List[int]:
+        """Return the indices with SequenceMatcher ratio >= threshold, in document order."""
+        if threshold <= 0:
+            return list(range(len(index.elements)))
+        # ratio = 2M / (a + b) and M <= min(a, b), so the shorter side bounds the ratio
+        query_len = len(search_lower)
+        min_len = query_len * threshold / (2 - threshold)
+        max_len = query_len * (2 - threshold) / threshold
+        candidates = np.flatnonzero((index.lengths >= min_len) & (index.lengths <= max_len))
+
+        matched = []
+        for i in candidates.tolist():
+            matcher = SequenceMatcher(None, index.elements[i].text.lower(), search_lower)
+            if matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold \
+                    and matcher.ratio() >= threshold:
+                matched.append(i)
+        return matched
+
+
+MATCHERS = {
+    SequenceElementMatcher.name: SequenceElementMatcher,
+    NgramElementMatcher.name: NgramElementMatcher,
+}
+
+
+def render_batch_matches(queries: Sequence[BatchQuery], results: List[List[Tuple[PageElement, float]]]) -> str:
+    """Render batch results with each matched element listed once and referenced by id per query."""
+    ids: Dict[int, str] = {}
+    listed: List[str] = []
+    groups: List[str] = []
+    for query, matches in zip(queries, results):
+        refs = []
+        for elem, score in matches:
+            if id(elem) not in ids:
+                ids[id(elem)] = f"e{len(ids) + 1}"
+                listed.append(f"[{ids[id(elem)]}] {elem.element_string}")
+            refs.append(f"{ids[id(elem)]} ({score:.2f})")
+        tags = f" ({', '.join(sorted(query.tags))})" if query.tags else ""
+        groups.append(f'"{query.text}"{tags}: ' + (", ".join(refs) if refs else "no match"))
+    if not listed:
+        return "No elements found."
+    return "Elements:\n" + "\n".join(listed) + "\n\nMatches:\n" + "\n".join(groups)
+
+
+def get_matcher(name: str = FUZZY_MATCHER) -> ElementMatcher:
+    """Return a matcher engine by name."""
+    if name not in MATCHERS:
+        raise ValueError(f"Unknown fuzzy matcher [{name}], expected one of {sorted(MATCHERS)}")
+    return MATCHERS[name]()
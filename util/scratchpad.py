@@ -0,0 +1,217 @@
+import os
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from util.utils import TokenUtils
+
+# Load environment variables from .env
+load_dotenv()
+
+# Scratchpad settings
+SCRATCHPAD_KEEP_STEPS = int(os.getenv("SCRATCHPAD_KEEP_STEPS", "3"))
+MAX_PROMPT_TOKENS = int(os.getenv("MAX_PROMPT_TOKENS", "24000"))
+
+# Tools whose observations are page dumps, only useful while the agent is on that page
+PAGE_DUMP_TOOLS = frozenset(["fuzzy_fetch_html_tool", "fuzzy_fetch_batch_tool", "fetch_all_elements_tool"])
+# Tools that leave the current page
+NAVIGATION_TOOLS = frozenset(["navigate_tool", "navigate_back_tool"])
+
+# Longest outcome text kept in a digest
+DIGEST_OUTCOME_CHARS = 160
+
+
+class ScratchpadManager:
+    """Render the ReAct scratchpad within a token budget.
+
+    The last keep_steps steps are sent verbatim; older ones are replaced by one-line
+    digests (page, action, input such as the selector, outcome). Page dumps are
+    reduced to a digest as soon as the agent moves to another page, and the newest
+    step is truncated if it alone would overflow the budget.
+    """
+
+    def __init__(self, keep_steps: int = SCRATCHPAD_KEEP_STEPS, max_prompt_tokens: int = MAX_PROMPT_TOKENS):
+        self.keep_steps = keep_steps
+        self.max_prompt_tokens = max_prompt_tokens
+        self.reset()
+
+    def reset(self, reserved_tokens: int = 0) -> None:
+        """Start a new run; reserved_tokens is the prompt size without the scratchpad."""
+        self.reserved_tokens = reserved_tokens
+        self._counts: Dict[Tuple[int, str], int] = {}
+        self.calls = 0
+        self.full_tokens = 0
+        self.sent_tokens = 0
+
+    @property
+    def budget(self) -> int:
+        return max(self.max_prompt_tokens - self.reserved_tokens, 0)
+
+    def format(self, intermediate_steps: List[Tuple[Any, str]]) -> str:
+        """Return the scratchpad for the next LLM call."""
+        if not intermediate_steps:
+            return ""
+
+        urls = self._step_urls(intermediate_steps)
+        stale = self._stale_dumps(intermediate_steps, urls)
+        last = len(intermediate_steps) - 1
+        verbatim = [
+            i for i in range(max(0, len(intermediate_steps) - self.keep_steps), last) if i not in stale
+        ] + [last]
+
+        texts = {i: self._full(step) for i, step in enumerate(intermediate_steps)}
+        digests = {
+            i: self._digest(i, step, urls[i], i in stale)
+            for i, step in enumerate(intermediate_steps)
+            if i != last
+        }
+
+        def cost(kept: List[int]) -> int:
+            return sum(
+                self._count(i, "full", texts[i]) if i in kept else self._count(i, "digest", digests[i])
+                for i in range(len(intermediate_steps))
+            )
+
+        # Fall back to digests for the older verbatim steps while over budget
+        while len(verbatim) > 1 and cost(verbatim) > self.budget:
+            verbatim.pop(0)
+
+        # Drop the oldest digests, then truncate the newest step, if that is still not enough
+        omitted = 0
+        newest = texts[last]
+        total = cost(verbatim)
+        while total > self.budget and omitted < last and omitted not in verbatim:
+            total -= self._count(omitted, "digest", digests[omitted])
+            omitted += 1
+        if total > self.budget:
+            newest = TokenUtils.truncate_to_tokens(newest, max(self.budget - (total - self._count(last, "full", newest)), 0))
+            newest += "\n(observation truncated to fit the prompt budget)\nThought: "
+            total = self.budget
+
+        lines = []
+        if omitted:
+            lines.append(f"({omitted} earlier steps omitted)\n")
+        summarized = [i for i in range(omitted, last) if i not in verbatim]
+        if summarized:
+            lines.append("Earlier steps (summarized):\n")
+            lines.extend(digests[i] for i in summarized)
+        lines.extend(texts[i] for i in verbatim if i != last)
+        lines.append(newest)
+
+        self.calls += 1
+        self.full_tokens += sum(self._count(i, "full", texts[i]) for i in range(len(intermediate_steps)))
+        self.sent_tokens += total
+        return "".join(lines)
+
+    def bound_steps(self, intermediate_steps: List[Tuple[Any, str]]) -> List[Tuple[Any, str]]:
+        """Return the steps with observations digested or truncated to fit the budget.
+
+        Used with native tool calling, where every tool call has to be answered by a
+        tool message; steps are therefore never dropped, only shortened.
+        """
+        if not intermediate_steps:
+            return []
+
+        urls = self._step_urls(intermediate_steps)
+        stale = self._stale_dumps(intermediate_steps, urls)
+        last = len(intermediate_steps) - 1
+        verbatim = [
+            i for i in range(max(0, len(intermediate_steps) - self.keep_steps), last) if i not in stale
+        ] + [last]
+        observations = {i: str(step[1]) for i, step in enumerate(intermediate_steps)}
+        digests = {
+            i: self._digest(i, step, urls[i], i in stale).strip()
+            for i, step in enumerate(intermediate_steps)
+        }
+
+        def cost(kept: List[int]) -> int:
+            return sum(
+                self._count(i, "observation", observations[i]) if i in kept else self._count(i, "digest", digests[i])
+                for i in range(len(intermediate_steps))
+            )
+
+        while len(verbatim) > 1 and cost(verbatim) > self.budget:
+            verbatim.pop(0)
+        total = cost(verbatim)
+        newest = observations[last]
+        if total > self.budget:
+            newest_tokens = self._count(last, "observation", newest)
+            newest = TokenUtils.truncate_to_tokens(newest, max(self.budget - (total - newest_tokens), 0))
+            newest += "\n(observation truncated to fit the prompt budget)"
+            total = self.budget
+
+        self.calls += 1
+        self.full_tokens += sum(self._count(i, "observation", observations[i]) for i in range(len(intermediate_steps)))
+        self.sent_tokens += total
+        return [
+            (action, newest if i == last else observations[i] if i in verbatim else digests[i])
+            for i, (action, _) in enumerate(intermediate_steps)
+        ]
+
+    def report(self) -> Dict[str, int]:
+        """Return the scratchpad tokens sent this run against what the full log would have cost."""
+        return {
+            "llm_calls": self.calls,
+            "full_scratchpad_tokens": self.full_tokens,
+            "sent_scratchpad_tokens": self.sent_tokens,
+            "saved_tokens": self.full_tokens - self.sent_tokens,
+        }
+
+    def _count(self, index: int, kind: str, text: str) -> int:
+        """Count tokens once per step; steps do not change once they are taken."""
+        key = (index, kind)
+        if key not in self._counts:
+            self._counts[key] = TokenUtils.token_count(text)
+        return self._counts[key]
+
+    @staticmethod
+    def _full(step: Tuple[Any, str]) -> str:
+        """The step as LangChain's format_log_to_str renders it."""
+        action, observation = step
+        return f"{action.log}\nObservation: {observation}\nThought: "
+
+    @staticmethod
+    def _digest(index: int, step: Tuple[Any, str], url: Optional[str], stale: bool) -> str:
+        action, observation = step
+        if action.tool in PAGE_DUMP_TOOLS:
+            outcome = "page elements (dropped after leaving the page)" if stale else "page elements (summarized)"
+        else:
+            outcome = " ".join(str(observation).split())[:DIGEST_OUTCOME_CHARS]
+        tool_input = " ".join(str(action.tool_input).split())[:DIGEST_OUTCOME_CHARS]
+        return f"- step {index + 1} on {url or 'unknown page'}: {action.tool}({tool_input}) -> {outcome}\n"
+
+    @staticmethod
+    def _dump_url(tool_input: Any) -> Optional[str]:
+        try:
+            data = json.loads(tool_input) if isinstance(tool_input, str) else tool_input
+            return data.get("url")
+        except (ValueError, AttributeError):
+            return None
+
+    def _step_urls(self, steps: List[Tuple[Any, str]]) -> List[Optional[str]]:
+        """The page each step acted on, as far as the tool inputs tell."""
+        urls = []
+        current = None
+        for action, _ in steps:
+            if action.tool == "navigate_tool":
+                current = str(action.tool_input).strip().strip('"')
+            elif action.tool in PAGE_DUMP_TOOLS:
+                current = self._dump_url(action.tool_input) or current
+            urls.append(current)
+        return urls
+
+    def _stale_dumps(self, steps: List[Tuple[Any, str]], urls: List[Optional[str]]) -> set:
+        """Page dumps taken before the agent navigated away or inspected another page."""
+        stale = set()
+        left_page = False
+        latest_url = None
+        for i in range(len(steps) - 1, -1, -1):
+            action = steps[i][0]
+            if action.tool in PAGE_DUMP_TOOLS:
+                if left_page or (latest_url is not None and urls[i] != latest_url):
+                    stale.add(i)
+                latest_url = latest_url or urls[i]
+            elif action.tool in NAVIGATION_TOOLS:
+                left_page = True
+        return stale
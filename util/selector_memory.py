@@ -0,0 +1,171 @@
+import os
+import re
+import time
+import sqlite3
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Selector memory settings
+SELECTOR_MEMORY = os.getenv("SELECTOR_MEMORY", "true").lower() not in ("0", "false", "no")
+SELECTOR_DB_PATH = os.getenv("SELECTOR_DB_PATH", "selectors.db")
+# Seconds after which an unused selector counts half as much (default 14 days)
+SELECTOR_HALF_LIFE = float(os.getenv("SELECTOR_HALF_LIFE", str(14 * 24 * 3600)))
+
+# Entries whose decayed score falls below this are deleted
+MIN_SCORE = 0.25
+# Words that do not change which element a description refers to
+STOP_WORDS = frozenset(["a", "an", "the", "of", "on", "in", "to", "for", "with", "and"])
+
+logger = get_logger(__name__)
+
+
+def url_pattern(url: str) -> str:
+    """Site and path of a URL, with path segments that hold ids or numbers replaced by *."""
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    segments = ["*" if re.search(r"\d", segment) else segment.lower() for segment in parsed.path.split("/") if segment]
+    return "/".join([host] + segments)
+
+
+def normalize_description(text: str) -> str:
+    """Lower-case words of an element description, without punctuation and filler words."""
+    return " ".join(word for word in re.findall(r"\w+", text.lower()) if word not in STOP_WORDS)
+
+
+class SelectorMemory:
+    """SQLite store of selectors that worked, keyed by URL pattern and element description.
+
+    Each success adds one to an entry's score and each failure takes one off. The
+    score halves every SELECTOR_HALF_LIFE seconds without use, so selectors of
+    redesigned pages decay out instead of being retried forever.
+    """
+
+    def __init__(self, path: str = SELECTOR_DB_PATH, half_life_seconds: float = SELECTOR_HALF_LIFE):
+        self.half_life_seconds = half_life_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS selectors (
+                    pattern TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    selector TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (pattern, description, selector)
+                )
+                """
+            )
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.recorded = 0
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _decayed(self, score: float, updated_at: float, now: float) -> float:
+        return score * 0.5 ** (max(now - updated_at, 0.0) / self.half_life_seconds)
+
+    def _candidates(self, pattern: str, description: str) -> List[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT selector, score, updated_at FROM selectors WHERE pattern = ? AND description = ?",
+                (pattern, description),
+            ).fetchall()
+            scored = [(self._decayed(score, updated_at, now), selector) for selector, score, updated_at in rows]
+            decayed = [selector for score, selector in scored if score < MIN_SCORE]
+            self._conn.executemany(
+                "DELETE FROM selectors WHERE pattern = ? AND description = ? AND selector = ?",
+                [(pattern, description, selector) for selector in decayed],
+            )
+        return [selector for score, selector in sorted(scored, reverse=True) if score >= MIN_SCORE]
+
+    def _record(self, pattern: str, description: str, selector: str, succeeded: bool) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT score, updated_at FROM selectors WHERE pattern = ? AND description = ? AND selector = ?",
+                (pattern, description, selector),
+            ).fetchone()
+            if row is None:
+                # Only selectors that worked are learned; failures only count against known ones
+                if succeeded:
+                    self._conn.execute(
+                        "INSERT INTO selectors VALUES (?, ?, ?, 1.0, 1, 0, ?)", (pattern, description, selector, now)
+                    )
+                return
+            score = self._decayed(row[0], row[1], now) + (1.0 if succeeded else -1.0)
+            column = "successes" if succeeded else "failures"
+            self._conn.execute(
+                f"UPDATE selectors SET score = ?, {column} = {column} + 1, updated_at = ? "
+                "WHERE pattern = ? AND description = ? AND selector = ?",
+                (score, now, pattern, description, selector),
+            )
+
+    async def lookup(self, page: Any, description: str, exclude: frozenset = frozenset()) -> Optional[str]:
+        """Return the best remembered selector for the description that is visible on the page.
+
+        Selectors that are no longer on the page count as failures, so they decay faster.
+        """
+        key = normalize_description(description)
+        if not key:
+            return None
+        pattern = url_pattern(page.url)
+        candidates = [s for s in await asyncio.to_thread(self._candidates, pattern, key) if s not in exclude]
+        for selector in candidates:
+            try:
+                visible = await page.locator(selector).first.is_visible()
+            except Exception:
+                visible = False
+            if visible:
+                self.hits += 1
+                return selector
+            await asyncio.to_thread(self._record, pattern, key, selector, False)
+        if candidates:
+            self.stale += 1
+        else:
+            self.misses += 1
+        return None
+
+    async def record(self, url: str, description: str, selector: str, succeeded: bool) -> None:
+        """Learn a selector that worked for the description on the URL, or count a failure against it."""
+        key = normalize_description(description)
+        if not key:
+            return
+        await asyncio.to_thread(self._record, url_pattern(url), key, selector, succeeded)
+        if succeeded:
+            self.recorded += 1
+
+    async def metrics(self) -> Dict[str, Any]:
+        """Return lookup statistics; the entry count is read in a worker thread."""
+        lookups = self.hits + self.misses + self.stale
+        entries = (await asyncio.to_thread(self._execute, "SELECT COUNT(*) FROM selectors"))[0][0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "recorded": self.recorded,
+            "entries": entries,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,240 @@
+import os
+import glob
+import json
+import time
+import uuid
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from util.logging_util import get_logger, log_context
+
+logger = get_logger(__name__)
+
+# Directory the per-run JSONL span files are written to
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+
+_current_tracer: contextvars.ContextVar[Optional["Tracer"]] = contextvars.ContextVar("current_tracer", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A timed step of a run, exported in an OpenTelemetry-like shape."""
+
+    def __init__(self, trace_id: str, name: str, kind: str, parent_id: Optional[str] = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes)
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.status = "ERROR"
+            self.attributes["error"] = str(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Collects the spans of one agent run and writes them to a JSONL file."""
+
+    def __init__(self, run_id: Optional[str] = None, trace_dir: str = TRACE_DIR):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.trace_dir = trace_dir
+        self.spans: List[Span] = []
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.trace_dir, f"{self.run_id}.jsonl")
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span] = None, **attributes) -> Span:
+        parent = parent or _current_span.get()
+        span = Span(self.run_id, name, kind, parent.span_id if parent else None, **attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def activate(self) -> Iterator["Tracer"]:
+        """Make this tracer current for the enclosed code, including tasks it starts.
+
+        Records logged meanwhile carry the run id.
+        """
+        token = _current_tracer.set(self)
+        try:
+            with log_context(self.run_id):
+                yield self
+        finally:
+            _current_tracer.reset(token)
+
+    def export(self) -> str:
+        """Write the finished spans as JSONL and return the file path."""
+        os.makedirs(self.trace_dir, exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for span in self.spans:
+                f.write(json.dumps(span.to_dict(), default=str) + "\n")
+        return self.path
+
+    def summary(self) -> Dict[str, Any]:
+        return summarize([span.to_dict() for span in self.spans])
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Optional[Span]]:
+    """Record a span on the current tracer; a no-op outside a traced run."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield None
+        return
+    current = tracer.start_span(name, kind, **attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    else:
+        current.end()
+    finally:
+        _current_span.reset(token)
+
+
+def annotate(**attributes) -> None:
+    """Add attributes, such as cache hits, to the innermost active span."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def traced_tool(func):
+    """Wrap an async tool so each call is recorded with its payload and result sizes."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        payload_bytes = sum(len(str(value)) for value in list(args) + list(kwargs.values()))
+        with span(func.__name__, kind="tool", input_bytes=payload_bytes) as current:
+            result = await func(*args, **kwargs)
+            if current is not None:
+                current.set(output_bytes=len(str(result)))
+            return result
+
+    return wrapper
+
+
+def summarize(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate span durations by kind and name, plus token and cache totals."""
+    by_name: Dict[str, Dict[str, Any]] = {}
+    totals = {
+        "prompt_tokens": 0, "completion_tokens": 0, "cache_hits": 0, "cache_misses": 0,
+        "llm_cache_hits": 0, "llm_cache_misses": 0,
+    }
+    for item in spans:
+        key = f"{item['kind']}:{item['name']}"
+        entry = by_name.setdefault(key, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "errors": 0})
+        entry["count"] += 1
+        entry["total_ms"] = round(entry["total_ms"] + item["duration_ms"], 3)
+        entry["max_ms"] = max(entry["max_ms"], item["duration_ms"])
+        if item["status"] == "ERROR":
+            entry["errors"] += 1
+
+        attributes = item["attributes"]
+        totals["prompt_tokens"] += attributes.get("prompt_tokens", 0)
+        totals["completion_tokens"] += attributes.get("completion_tokens", 0)
+        if "cache_hit" in attributes:
+            totals["cache_hits" if attributes["cache_hit"] else "cache_misses"] += 1
+        if "llm_cache_hit" in attributes:
+            totals["llm_cache_hits" if attributes["llm_cache_hit"] else "llm_cache_misses"] += 1
+
+    roots = [item for item in spans if item["parent_span_id"] is None and item["end_time_unix_nano"]]
+    wall_ms = (
+        (max(item["end_time_unix_nano"] for item in roots) - min(item["start_time_unix_nano"] for item in roots)) / 1e6
+        if roots else 0.0
+    )
+    return {"wall_ms": round(wall_ms, 3), "spans": by_name, **totals}
+
+
+def load_summary(run_id: str, trace_dir: str = TRACE_DIR) -> Optional[Dict[str, Any]]:
+    """Summarize an exported run, or return None if it has no trace file.
+
+    A fanned-out job keeps its planning trace under run_id and each sub-task under
+    <run_id>-<i>; their spans are summarized together.
+    """
+    paths = glob.glob(os.path.join(glob.escape(trace_dir), f"{glob.escape(run_id)}.jsonl"))
+    paths += sorted(glob.glob(os.path.join(glob.escape(trace_dir), f"{glob.escape(run_id)}-*.jsonl")))
+    if not paths:
+        return None
+    spans = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    summary = summarize(spans)
+    summary["runs"] = [os.path.basename(path)[:-len(".jsonl")] for path in paths]
+    return summary
+
+
+class TracingCallbackHandler(AsyncCallbackHandler):
+    """Record LLM calls of an agent run as spans with token counts."""
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self._open: Dict[UUID, Span] = {}
+
+    async def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs) -> None:
+        prompt_bytes = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._open[run_id] = self.tracer.start_span("chat_model", "llm", prompt_bytes=prompt_bytes)
+
+    async def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs) -> None:
+        self._open[run_id] = self.tracer.start_span("llm", "llm", prompt_bytes=sum(len(p) for p in prompts))
+
+    async def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        current = self._open.pop(run_id, None)
+        if current is None:
+            return
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if not usage and response.generations and response.generations[0]:
+            # Fall back to the usage metadata attached to the message
+            metadata = getattr(getattr(response.generations[0][0], "message", None), "usage_metadata", None) or {}
+            usage = {
+                "prompt_tokens": metadata.get("input_tokens", 0),
+                "completion_tokens": metadata.get("output_tokens", 0),
+            }
+        current.set(
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+        if "cache_hit" in (response.llm_output or {}):
+            current.set(llm_cache_hit=response.llm_output["cache_hit"])
+        current.end()
+
+    async def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        current = self._open.pop(run_id, None)
+        if current is not None:
+            current.end(error=error)
@@ -1,28 +1,81 @@
 import os
-import tiktoken
+from functools import lru_cache
+from typing import TYPE_CHECKING, List
+
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    import tiktoken
+
 # Load environment variables from .env
 load_dotenv()
 
 MODEL_NAME = os.getenv("OPENAI_MODEL_NAME")
 
+# Encoding used when the configured model is unknown to tiktoken
+FALLBACK_ENCODING = "o200k_base"
+
+# Text is encoded in blocks of about this many characters when truncating
+ENCODE_BLOCK_CHARS = 16_000
+
+
 class TokenUtils:
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def encoding(model_name: str = None) -> "tiktoken.Encoding":
+        """Return the (cached) tiktoken encoding for a model; tiktoken is imported on first use."""
+        import tiktoken
+
+        model_name = model_name or MODEL_NAME
+        if model_name:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                pass
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+    @staticmethod
+    def fits_without_encoding(prompt: str, max_tokens: int) -> bool:
+        """Cheap check: a BPE token is at least one byte, so a short enough text always fits."""
+        return len(prompt) <= max_tokens // 4 or len(prompt.encode("utf-8")) <= max_tokens
+
+    @staticmethod
+    def truncate_to_tokens(prompt: str, max_tokens: int) -> str:
+        """Truncate a prompt to max_tokens, encoding it block by block and stopping once the budget is spent."""
+        if TokenUtils.fits_without_encoding(prompt, max_tokens):
+            return prompt
+
+        encoding = TokenUtils.encoding()
+        kept: List[str] = []
+        remaining = max_tokens
+        for block in TokenUtils._blocks(prompt):
+            tokens = encoding.encode(block)
+            if len(tokens) > remaining:
+                kept.append(encoding.decode(tokens[:remaining]))
+                break
+            kept.append(block)
+            remaining -= len(tokens)
+        return "".join(kept)
+
     @staticmethod
     def truncate_to_10000_tokens(prompt: str) -> str:
         """Truncate a prompt to 10,000 tokens using tiktoken."""
-        model_name = MODEL_NAME
-        encoding = tiktoken.encoding_for_model(model_name)
-        tokens = encoding.encode(prompt)
-
-        if len(tokens) > 10000:
-            tokens = tokens[:10000]
-        return encoding.decode(tokens)
-    
+        return TokenUtils.truncate_to_tokens(prompt, 10000)
+
     @staticmethod
     def token_count(prompt: str):
         """ Get token cound for prompt"""
-        model_name = MODEL_NAME
-        encoding = tiktoken.encoding_for_model(model_name) 
-        count = len(encoding.encode(prompt))
-        return count
\ No newline at end of file
+        return len(TokenUtils.encoding().encode(prompt))
+
+    @staticmethod
+    def _blocks(prompt: str):
+        """Yield consecutive blocks of the prompt, split after a newline where possible."""
+        start = 0
+        while start < len(prompt):
+            end = min(start + ENCODE_BLOCK_CHARS, len(prompt))
+            if end < len(prompt):
+                newline = prompt.rfind("\n", start, end)
+                if newline > start:
+                    end = newline + 1
+            yield prompt[start:end]
+            start = end
@@ -0,0 +1,67 @@
+import os
+import time
+import asyncio
+import importlib
+from typing import Dict
+
+from dotenv import find_dotenv
+from dotenv import load_dotenv
+
+from util.logging_util import get_logger
+
+# Load the environment variables
+load_dotenv(find_dotenv())
+
+# Preload the model client, tokenizer and parsers in the background when the app starts
+WARM_UP = os.getenv("WARM_UP", "true").lower() not in ("0", "false", "no")
+
+# Modules the Agent imports on first use
+AGENT_MODULES = (
+    "openai",
+    "langchain.agents",
+    "langchain.agents.format_scratchpad.tools",
+    "langchain.agents.output_parsers",
+    "langchain.agents.output_parsers.tools",
+    "tools",
+)
+
+logger = get_logger(__name__)
+
+
+def preload() -> Dict[str, float]:
+    """Build everything the first run would otherwise build, and return the time each part took in ms."""
+    from llm.model import ChatModel
+    from util.dom_snapshot import PageSnapshot
+    from util.matcher import get_matcher
+    from util.utils import TokenUtils
+
+    timings: Dict[str, float] = {}
+
+    def timed(name, func):
+        start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"Warm-up of {name} failed: {e}")
+        timings[name] = round((time.perf_counter() - start) * 1000, 3)
+
+    timed("agent_modules", lambda: [importlib.import_module(name) for name in AGENT_MODULES])
+    timed("chat_model", lambda: ChatModel.chat_model)
+    timed("tokenizer", lambda: TokenUtils.encoding().encode("warm up"))
+    snapshot = None
+
+    def parse():
+        nonlocal snapshot
+        snapshot = PageSnapshot.from_html("about:blank", "<html><body><button>warm up</button></body></html>")
+
+    timed("html_parser", parse)
+    timed("matcher", lambda: get_matcher().match(snapshot, "warm up"))
+    return timings
+
+
+async def warm_up() -> Dict[str, float]:
+    """Run preload() in a worker thread, off the event loop and the request path."""
+    start = time.perf_counter()
+    timings = await asyncio.to_thread(preload)
+    logger.info(f"Warm-up finished in {(time.perf_counter() - start) * 1000:.0f} ms: {timings}")
+    return timings